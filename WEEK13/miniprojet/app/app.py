@@ -1,8 +1,9 @@
 import streamlit as st
-import asyncio
 import json
 from app.orchestrator import MCPOrchestrator
+from app.job_runner import JobRunner
 from app.log_utils import logger
+from app.log_reader import LogReader
 
 # Configuration de la page
 st.set_page_config(
@@ -23,6 +24,54 @@ Elle combine la puissance d'arXiv, la gestion de fichiers et le nettoyage de cit
 def get_orchestrator():
     return MCPOrchestrator()
 
+# Les recherches s'exécutent en tâche de fond, indépendamment de la session Streamlit
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(get_orchestrator())
+
+def show_job(job_id: str):
+    """Affiche un job et suit sa progression jusqu'à la fin"""
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None:
+        st.warning("Recherche introuvable.")
+        return
+    
+    st.subheader("Résultats")
+    st.caption(job["query"])
+    status = st.empty()
+    steps_area = st.empty()
+    result_area = st.empty()
+    
+    while True:
+        if job["status"] == "queued":
+            status.info("En attente d'un emplacement libre...")
+        elif job["status"] == "running":
+            label = job["steps"][-1]["label"] if job["steps"] else "Démarrage"
+            status.info(f"{label} en cours...")
+        
+        lines = []
+        for step in job["steps"]:
+            tools = ", ".join(f"{'✅' if tool['success'] else '❌'} {tool['name']}" for tool in step["tools"])
+            lines.append(f"- {step['label']}" + (f": {tools}" if tools else ""))
+        steps_area.markdown("\n".join(lines))
+        
+        if job["status"] not in ("queued", "running"):
+            break
+        result_area.markdown(job["partial"])
+        job = runner.wait(job_id, job["version"], timeout=1.0) or job
+    
+    if job["status"] == "done":
+        status.success("Recherche terminée!")
+        result_area.write(job["result"])
+    else:
+        status.error(f"Erreur lors de l'exécution: {job['error']}")
+
+# Index des logs partagé entre les rafraîchissements: seules les nouvelles lignes sont lues
+@st.cache_resource
+def get_log_reader():
+    return LogReader()
+
 # Section principale
 def main():
     tab1, tab2, tab3 = st.tabs(["Recherche", "Configuration", "Journal"])
@@ -36,27 +85,30 @@ def main():
             placeholder="Ex: Trouve les derniers articles sur les transformers en NLP, télécharge les PDFs pertinents, et crée un résumé avec les citations formatées correctement."
         )
         
-        if st.button("Lancer la recherche", type="primary"):
+        col1, col2 = st.columns([1, 4])
+        launch = col1.button("Lancer la recherche", type="primary")
+        force = col2.checkbox("Relancer même si un résultat existe", value=False)
+        
+        if launch:
             if not query:
                 st.warning("Veuillez entrer une requête de recherche.")
             else:
-                with st.spinner("Initialisation des serveurs MCP..."):
-                    orchestrator = get_orchestrator()
-                    try:
-                        # Initialisation asynchrone
-                        async def initialize_and_execute():
-                            await orchestrator.initialize_servers()
-                            return await orchestrator.plan_and_execute(query)
-                        
-                        result = asyncio.run(initialize_and_execute())
-                        
-                        st.success("Recherche terminée!")
-                        st.subheader("Résultats")
-                        st.write(result)
-                        
-                    except Exception as e:
-                        st.error(f"Erreur lors de l'exécution: {str(e)}")
-                        logger.error(f"Erreur: {str(e)}")
+                try:
+                    # L'identifiant du job est gardé dans l'URL pour le retrouver après un rechargement
+                    job_id = get_job_runner().submit(query, force=force)
+                    st.session_state["job_id"] = job_id
+                    st.query_params["job"] = job_id
+                except Exception as e:
+                    st.error(f"Erreur lors de l'exécution: {str(e)}")
+                    logger.error(f"Erreur: {str(e)}")
+        
+        job_id = st.session_state.get("job_id") or st.query_params.get("job")
+        if job_id:
+            show_job(job_id)
+        
+        with st.expander("Recherches récentes"):
+            for job in get_job_runner().recent():
+                st.markdown(f"[{job['query'][:80]}](?job={job['id']}) — {job['status']}")
     
     with tab2:
         st.header("Configuration")
@@ -79,13 +131,46 @@ def main():
     
     with tab3:
         st.header("Journal d'exécution")
-        if st.button("Rafraîchir les logs"):
-            try:
-                with open("app.log", "r") as f:
-                    logs = f.read()
-                st.text_area("Logs", logs, height=400)
-            except:
-                st.warning("Aucun log disponible")
+        reader = get_log_reader()
+        st.button("Rafraîchir les logs")
+        reader.refresh()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        tool = col1.selectbox("Outil", ["Tous"] + reader.tools())
+        status_filter = col2.selectbox("Statut", ["Tous", "Succès", "Échec"])
+        level = col3.selectbox("Niveau", ["Tous", "INFO", "WARNING", "ERROR"])
+        page_size = col4.selectbox("Lignes par page", [25, 50, 100, 200], index=1)
+        
+        filters = {
+            "tool": None if tool == "Tous" else tool,
+            "success": {"Tous": None, "Succès": True, "Échec": False}[status_filter],
+            "level": None if level == "Tous" else level
+        }
+        _, total = reader.query(page_size=0, **filters)
+        pages = max(1, -(-total // page_size))
+        page = st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, value=1) - 1
+        entries, total = reader.query(page=page, page_size=page_size, **filters)
+        
+        if not total:
+            st.warning("Aucun log disponible")
+        else:
+            st.caption(f"{total} entrées sur {reader.total()} indexées, les plus récentes d'abord")
+            st.dataframe(
+                [
+                    {
+                        "Horodatage": entry.get("timestamp"),
+                        "Niveau": entry.get("level"),
+                        "Outil": entry.get("tool"),
+                        "Succès": entry.get("success"),
+                        "Durée (s)": entry.get("elapsed_s"),
+                        "Message": entry.get("message")
+                    }
+                    for entry in entries
+                ],
+                use_container_width=True
+            )
+            with st.expander("Détails de la page"):
+                st.json(entries)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# Caractères ajoutés à un résultat tronqué ("Résultat: " et la mention de troncature), plus
+# l'arrondi de estimate_tokens
+TRUNCATION_OVERHEAD = len("Résultat: … [tronqué, 0000000000 caractères]") + 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière: ~4 caractères par jeton"""
+    return len(text) // 4 + 1
+
+class ContextWindow:
+    """Historique des appels d'outils de plan_and_execute, borné par un budget de jetons.
+    
+    Les résultats les plus récents restent intacts; les plus anciens sont tronqués puis
+    réduits à une ligne quand le budget est dépassé, et un résultat identique à un
+    précédent n'est pas renvoyé une seconde fois.
+    """
+    
+    def __init__(self, token_budget: Optional[int] = None, keep_recent: Optional[int] = None,
+                 summary_chars: Optional[int] = None):
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+        self.keep_recent = keep_recent or int(os.getenv("CONTEXT_KEEP_RECENT", 2))
+        self.summary_chars = summary_chars or int(os.getenv("CONTEXT_SUMMARY_CHARS", 300))
+        self.entries: List[Dict[str, Any]] = []
+        self._seen: Dict[str, int] = {}
+    
+    def add(self, tool_name: str, arguments: Dict, result: Any):
+        """Enregistre un appel d'outil et son résultat"""
+        text = json.dumps(result, ensure_ascii=False, default=str)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        index = len(self.entries)
+        
+        duplicate_of = self._seen.get(digest)
+        if duplicate_of is None:
+            self._seen[digest] = index
+        
+        self.entries.append({
+            "call": f"Exécution de {tool_name} avec {arguments}",
+            "tool": tool_name,
+            "result": text,
+            "duplicate_of": duplicate_of
+        })
+    
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages à joindre au prompt, dans la limite du budget"""
+        recent_start = max(0, len(self.entries) - self.keep_recent)
+        levels = ["full" if i >= recent_start else "summary" for i in range(len(self.entries))]
+        
+        rendered = [self._render(entry, level) for entry, level in zip(self.entries, levels)]
+        total = sum(estimate_tokens(call) + estimate_tokens(result) for call, result in rendered)
+        
+        # Les résultats les plus anciens sont réduits en premier
+        for i in range(recent_start):
+            if total <= self.token_budget:
+                break
+            before = estimate_tokens(rendered[i][1])
+            rendered[i] = self._render(self.entries[i], "minimal")
+            total -= before - estimate_tokens(rendered[i][1])
+        
+        # En dernier recours, les résultats récents se partagent le budget restant
+        if total > self.token_budget and recent_start < len(self.entries):
+            used = sum(estimate_tokens(call) for call, _ in rendered)
+            used += sum(estimate_tokens(result) for _, result in rendered[:recent_start])
+            share = (self.token_budget - used) * 4 // (len(self.entries) - recent_start) - TRUNCATION_OVERHEAD
+            share = max(self.summary_chars, share)
+            for i in range(recent_start, len(self.entries)):
+                rendered[i] = self._render(self.entries[i], "full", limit=share)
+        
+        messages = []
+        for call, result in rendered:
+            messages.append({"role": "assistant", "content": call})
+            messages.append({"role": "user", "content": result})
+        return messages
+    
+    def token_count(self) -> int:
+        return sum(estimate_tokens(m["content"]) for m in self.messages())
+    
+    def _render(self, entry: Dict[str, Any], level: str, limit: Optional[int] = None) -> tuple:
+        text = entry["result"]
+        if entry["duplicate_of"] is not None:
+            return entry["call"], f"Résultat identique à celui de l'appel n°{entry['duplicate_of'] + 1}"
+        if level == "minimal":
+            return entry["call"], f"Résultat de {entry['tool']} omis ({len(text)} caractères)"
+        if level == "summary":
+            limit = self.summary_chars
+        if limit is not None and len(text) > limit:
+            text = f"{text[:limit]}… [tronqué, {len(text)} caractères]"
+        return entry["call"], f"Résultat: {text}"
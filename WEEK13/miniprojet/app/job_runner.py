@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.log_utils import logger
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobRunner:
+    """Exécute les recherches en tâche de fond sur la boucle du pool de sessions MCP.
+    
+    submit() renvoie immédiatement un identifiant de job; au plus max_workers recherches
+    s'exécutent en même temps, les autres attendent leur tour. La progression est suivie
+    étape par étape et les jobs terminés sont enregistrés dans SQLite: une page rechargée
+    retrouve son job, et une requête identique déjà traitée n'est pas relancée.
+    """
+    
+    def __init__(self, orchestrator, max_workers: Optional[int] = None, db_path: Optional[str] = None,
+                 result_ttl: Optional[float] = None):
+        self.orchestrator = orchestrator
+        self.max_workers = max_workers or int(os.getenv("JOB_MAX_WORKERS", 2))
+        self.db_path = db_path or os.getenv("JOB_DB", "jobs.db")
+        self.result_ttl = result_ttl or float(os.getenv("JOB_RESULT_TTL", 24 * 3600))
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._changed = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, query_key TEXT NOT NULL, query TEXT NOT NULL, status TEXT NOT NULL, "
+            "created REAL NOT NULL, finished REAL, steps TEXT, result TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_query_key ON jobs(query_key, finished)")
+        # Jobs restés actifs lors de l'arrêt précédent: leur exécution est perdue
+        self._db.execute(
+            "UPDATE jobs SET status = 'error', error = 'Interrompu par un redémarrage', finished = ? "
+            "WHERE status IN ('queued', 'running')", (time.time(),)
+        )
+        self._db.commit()
+    
+    @staticmethod
+    def query_key(query: str) -> str:
+        return hashlib.sha256(" ".join(query.split()).lower().encode("utf-8")).hexdigest()
+    
+    def submit(self, query: str, force: bool = False) -> str:
+        """Met une recherche en file et renvoie son identifiant (celui d'un job existant si possible)"""
+        key = self.query_key(query)
+        
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "query_key": key,
+            "query": query,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "steps": [],
+            "current": None,
+            "partial": "",
+            "result": None,
+            "error": None,
+            "version": 0
+        }
+        # Vérification et insertion sous le même verrou: deux submit() simultanés d'une même
+        # recherche ne lancent qu'un job
+        with self._changed:
+            for active in self._jobs.values():
+                if active["query_key"] == key and active["status"] in ACTIVE_STATUSES:
+                    return active["id"]
+            
+            if not force:
+                job_id = self._find_completed(key)
+                if job_id is not None:
+                    logger.info(f"Résultat réutilisé pour la recherche (job {job_id})")
+                    return job_id
+            
+            self._jobs[job["id"]] = job
+        self._persist(job)
+        
+        future = self.orchestrator.pool.submit(self._run(job["id"]))
+        future.add_done_callback(lambda f, job_id=job["id"]: self._on_done(job_id, f))
+        return job["id"]
+    
+    async def _run(self, job_id: str) -> str:
+        # Sémaphore créé dans la boucle du pool, où s'exécutent tous les jobs
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        
+        async with self._semaphore:
+            self._update(job_id, status="running", started=time.time())
+            return await self.orchestrator.plan_and_execute(
+                self._jobs[job_id]["query"], on_event=lambda event: self._on_event(job_id, event)
+            )
+    
+    def _on_event(self, job_id: str, event: Dict[str, Any]):
+        """Suivi étape par étape à partir des événements de plan_and_execute"""
+        with self._changed:
+            job = self._jobs[job_id]
+            if event["step"] != job["current"]:
+                job["current"] = event["step"]
+                job["partial"] = ""
+                label = "Planification" if event["step"] == "plan" else f"Étape {event['step'] + 1}"
+                job["steps"].append({"step": event["step"], "label": label, "tools": []})
+            
+            if event["type"] == "token":
+                job["partial"] += event["content"]
+            elif event["type"] == "tool_result":
+                job["steps"][-1]["tools"].append({"name": event["name"], "success": event["success"]})
+            job["version"] += 1
+            self._changed.notify_all()
+    
+    def _on_done(self, job_id: str, future):
+        try:
+            result = future.result()
+        except BaseException as e:
+            logger.error(f"Erreur du job {job_id}: {str(e)}")
+            self._update(job_id, status="error", error=str(e) or type(e).__name__, finished=time.time())
+        else:
+            self._update(job_id, status="done", result=result, finished=time.time())
+        self._persist(self._jobs[job_id])
+    
+    def _update(self, job_id: str, **changes):
+        with self._changed:
+            job = self._jobs[job_id]
+            job.update(changes)
+            job["version"] += 1
+            self._changed.notify_all()
+        if changes.get("status") == "running":
+            self._persist(job)
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Instantané d'un job (en mémoire s'il est actif, sinon depuis SQLite)"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return {**job, "steps": [dict(step, tools=list(step["tools"])) for step in job["steps"]]}
+        return self._load(job_id)
+    
+    def wait(self, job_id: str, version: int, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Attend un changement du job au-delà de version (ou le délai), puis renvoie son état"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]["version"] > version, timeout
+            )
+        return self.get(job_id)
+    
+    def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Derniers jobs, actifs ou terminés"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, query, status, created FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{"id": row[0], "query": row[1], "status": row[2], "created": row[3]} for row in rows]
+    
+    def _find_completed(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE query_key = ? AND status = 'done' AND finished > ? "
+                "ORDER BY finished DESC LIMIT 1",
+                (key, time.time() - self.result_ttl)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _persist(self, job: Dict[str, Any]):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, query_key, query, status, created, finished, steps, result, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["query_key"], job["query"], job["status"], job["created"], job["finished"],
+                 json.dumps(job["steps"], ensure_ascii=False), job["result"], job["error"])
+            )
+            self._db.commit()
+        
+        # Les jobs terminés ne sont plus suivis qu'en base
+        if job["status"] not in ACTIVE_STATUSES:
+            with self._changed:
+                self._jobs.pop(job["id"], None)
+                self._changed.notify_all()
+    
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, query_key, query, status, created, finished, steps, result, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "query_key": row[1], "query": row[2], "status": row[3], "created": row[4],
+            "started": None, "finished": row[5], "steps": json.loads(row[6] or "[]"), "current": None,
+            "partial": "", "result": row[7], "error": row[8], "version": -1
+        }
+    
+    def close(self):
+        with self._db_lock:
+            self._db.close()
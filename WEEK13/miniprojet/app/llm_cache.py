@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.log_utils import logger
+
+class CompletionCache:
+    """Cache des completions LLM adressé par contenu: LRU en mémoire + SQLite optionnel"""
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, db_path: Optional[str] = None):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", 256))
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+        self.db_path = db_path or os.getenv("LLM_CACHE_DB")
+        self.max_db_entries = int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", 5000))
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.db_path:
+            self._open_db()
+    
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions(accessed)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache SQLite indisponible ({self.db_path}): {str(e)}")
+            self._db = None
+    
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """Empreinte stable du modèle, des messages, des outils et des paramètres d'échantillonnage"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+            
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._db.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._evict_db(now)
+                self._db.commit()
+    
+    def _remember(self, key: str, created: float, value: Any):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict_db(self, now: float):
+        self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key IN ("
+            "SELECT key FROM completions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_db_entries,)
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory)
+        }
+    
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+    
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -1,14 +1,121 @@
 import os
+import asyncio
 import requests
 import json
-from typing import Dict, List, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional, AsyncIterator
 from app.log_utils import logger
+from app.llm_cache import CompletionCache
 
 class LLMClient:
     def __init__(self):
         self.backend = os.getenv("LLM_BACKEND", "groq").lower()
+        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        self.request_timeout = float(os.getenv("REQUEST_TIMEOUT", 30))
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", 10))
+        self.completion_timeout = float(os.getenv("LLM_COMPLETION_TIMEOUT", 120))
+        self.temperature = 0.1
+        self.max_tokens = 4000
+        # Les prompts de planification sont quasi déterministes: les réponses sont réutilisables
+        self.cache = CompletionCache() if os.getenv("LLM_CACHE", "true").lower() in ("1", "true", "yes") else None
+        self._groq_client = None
+        self._http_session = None
+        # Clients asynchrones, liés à la boucle d'événements qui les a créés
+        self._async_loop = None
+        self._async_groq_client = None
+        self._async_http_client = None
         self._validate_config()
     
+    @property
+    def model(self) -> str:
+        if self.backend == "groq":
+            return os.getenv("GROQ_MODEL", "llama3-70b-8192")
+        return os.getenv("OLLAMA_MODEL", "llama3")
+    
+    @property
+    def http_session(self) -> requests.Session:
+        """Session HTTP keep-alive réutilisée pour tous les appels Ollama"""
+        if self._http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._http_session = session
+        return self._http_session
+    
+    @property
+    def groq_client(self):
+        """Client Groq unique, avec son propre pool de connexions"""
+        if self._groq_client is None:
+            try:
+                import groq
+                import httpx
+            except ImportError:
+                raise ImportError("Le package groq est requis. Installez-le avec 'pip install groq'")
+            
+            self._groq_client = groq.Client(
+                api_key=os.getenv("GROQ_API_KEY"),
+                timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+                http_client=groq.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    )
+                )
+            )
+        return self._groq_client
+    
+    def _ensure_async_clients(self):
+        """Crée les clients asynchrones pour la boucle courante"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is loop:
+            return
+        
+        import httpx
+        self._async_loop = loop
+        self._async_groq_client = None
+        self._async_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        )
+        if self.backend == "groq":
+            try:
+                import groq
+            except ImportError:
+                raise ImportError("Le package groq est requis. Installez-le avec 'pip install groq'")
+            self._async_groq_client = groq.AsyncClient(
+                api_key=os.getenv("GROQ_API_KEY"),
+                timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+                http_client=groq.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    )
+                )
+            )
+    
+    async def aclose(self):
+        """Ferme les clients asynchrones (à appeler depuis leur boucle)"""
+        if self._async_groq_client is not None:
+            await self._async_groq_client.close()
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+        self._async_loop = None
+        self._async_groq_client = None
+        self._async_http_client = None
+    
+    def close(self):
+        """Ferme les clients HTTP ouverts"""
+        if self._groq_client is not None:
+            self._groq_client.close()
+            self._groq_client = None
+        if self._http_session is not None:
+            self._http_session.close()
+            self._http_session = None
+        if self.cache is not None:
+            self.cache.close()
+    
     def _validate_config(self):
         """Valide la configuration du backend LLM"""
         if self.backend == "groq" and not os.getenv("GROQ_API_KEY"):
@@ -16,78 +123,285 @@ class LLMClient:
         elif self.backend == "ollama":
             # Vérification basique qu'Ollama est accessible
             try:
-                requests.get(os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"), timeout=5)
+                self.http_session.get(self.ollama_base_url, timeout=self.connect_timeout)
             except:
                 logger.warning("Ollama n'est pas accessible. Vérifiez qu'il est installé et démarré.")
     
+    def _cache_key(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return CompletionCache.make_key(
+            backend=self.backend,
+            model=self.model,
+            messages=messages,
+            tools=tools or [],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+    
+    def _cache_store(self, key: Optional[str], response: Dict[str, Any]):
+        # Les erreurs ne sont jamais mises en cache
+        if key is not None and not response.get("error"):
+            self.cache.set(key, response)
+    
     def create_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """Crée une completion avec le backend configuré"""
+        key = self._cache_key(messages, tools)
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        
         if self.backend == "groq":
-            return self._create_groq_completion(messages, tools)
+            response = self._create_groq_completion(messages, tools)
         else:
-            return self._create_ollama_completion(messages, tools)
+            response = self._create_ollama_completion(messages, tools)
+        
+        self._cache_store(key, response)
+        return response
+    
+    async def acreate_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Version asynchrone de create_completion, qui ne bloque pas la boucle d'événements"""
+        key = self._cache_key(messages, tools)
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        
+        self._ensure_async_clients()
+        if self.backend == "groq":
+            request = self._acreate_groq_completion(messages, tools)
+        else:
+            request = self._acreate_ollama_completion(messages, tools)
+        
+        # L'annulation de la tâche appelante interrompt aussi la requête HTTP en cours
+        try:
+            response = await asyncio.wait_for(request, self.completion_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Délai de completion dépassé ({self.completion_timeout}s)")
+            return {"content": f"Erreur: délai de completion dépassé ({self.completion_timeout}s)", "tool_calls": None, "error": True}
+        
+        self._cache_store(key, response)
+        return response
+    
+    async def astream_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Diffuse la completion au fil de l'eau.
+        
+        Produit des événements {"type": "token"}, {"type": "tool_call_delta"} puis un
+        dernier {"type": "done"} contenant le texte complet et les appels d'outils assemblés.
+        """
+        key = self._cache_key(messages, tools)
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            # Réponse en cache: rejouée d'un bloc, sans aller-retour réseau
+            if cached["content"]:
+                yield {"type": "token", "content": cached["content"]}
+            for index, call in enumerate(cached["tool_calls"] or []):
+                yield {
+                    "type": "tool_call_delta",
+                    "index": index,
+                    "name": call["function"]["name"],
+                    "arguments": call["function"].get("arguments")
+                }
+            yield {"type": "done", **cached}
+            return
+        
+        self._ensure_async_clients()
+        if self.backend == "groq":
+            stream = self._astream_groq_completion(messages, tools)
+        else:
+            stream = self._astream_ollama_completion(messages, tools)
+        
+        deadline = asyncio.get_running_loop().time() + self.completion_timeout
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    event = await asyncio.wait_for(stream.__anext__(), max(remaining, 0))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    logger.error(f"Délai de completion dépassé ({self.completion_timeout}s)")
+                    yield {"type": "done", "content": f"Erreur: délai de completion dépassé ({self.completion_timeout}s)", "tool_calls": None, "error": True}
+                    return
+                if event["type"] == "done":
+                    self._cache_store(key, {k: v for k, v in event.items() if k != "type"})
+                yield event
+        finally:
+            await stream.aclose()
+    
+    def _groq_kwargs(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        completion_kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        
+        if tools:
+            completion_kwargs["tools"] = tools
+            completion_kwargs["tool_choice"] = "auto"
+        
+        return completion_kwargs
+    
+    def _groq_result(self, response) -> Dict[str, Any]:
+        tool_calls = getattr(response.choices[0].message, 'tool_calls', None)
+        return {
+            "content": response.choices[0].message.content,
+            # Dictionnaires simples, comme Ollama, pour pouvoir être mis en cache
+            "tool_calls": [call.model_dump() for call in tool_calls] if tool_calls else None
+        }
     
     def _create_groq_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """Utilise l'API Groq pour la completion"""
         try:
-            import groq
-            
-            client = groq.Client(api_key=os.getenv("GROQ_API_KEY"))
-            
-            completion_kwargs = {
-                "model": os.getenv("GROQ_MODEL", "llama3-70b-8192"),
-                "messages": messages,
-                "temperature": 0.1,
-                "max_tokens": 4000
-            }
-            
-            if tools:
-                completion_kwargs["tools"] = tools
-                completion_kwargs["tool_choice"] = "auto"
-            
-            response = client.chat.completions.create(**completion_kwargs)
-            
-            return {
-                "content": response.choices[0].message.content,
-                "tool_calls": getattr(response.choices[0].message, 'tool_calls', None)
-            }
+            client = self.groq_client
+            response = client.chat.completions.create(**self._groq_kwargs(messages, tools))
+            return self._groq_result(response)
             
         except ImportError:
             raise ImportError("Le package groq est requis. Installez-le avec 'pip install groq'")
         except Exception as e:
             logger.error(f"Erreur Groq: {str(e)}")
-            return {"content": f"Erreur: {str(e)}", "tool_calls": None}
+            return {"content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
     
-    def _create_ollama_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
-        """Utilise Ollama pour la completion"""
+    async def _acreate_groq_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Utilise l'API Groq asynchrone pour la completion"""
         try:
-            url = f"{os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')}/api/chat"
+            response = await self._async_groq_client.chat.completions.create(**self._groq_kwargs(messages, tools))
+            return self._groq_result(response)
             
-            payload = {
-                "model": os.getenv("OLLAMA_MODEL", "llama3"),
-                "messages": messages,
-                "options": {
-                    "temperature": 0.1
-                }
+        except Exception as e:
+            logger.error(f"Erreur Groq: {str(e)}")
+            return {"content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
+    
+    async def _astream_groq_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming Groq (stream=True): jetons et fragments d'appels d'outils"""
+        content = ""
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        try:
+            stream = await self._async_groq_client.chat.completions.create(**self._groq_kwargs(messages, tools), stream=True)
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                
+                if delta.content:
+                    content += delta.content
+                    yield {"type": "token", "content": delta.content}
+                
+                for call_delta in delta.tool_calls or []:
+                    call = tool_calls.setdefault(call_delta.index, {
+                        "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                    })
+                    function = call_delta.function
+                    if call_delta.id:
+                        call["id"] = call_delta.id
+                    if function and function.name:
+                        call["function"]["name"] += function.name
+                    if function and function.arguments:
+                        call["function"]["arguments"] += function.arguments
+                    yield {
+                        "type": "tool_call_delta",
+                        "index": call_delta.index,
+                        "name": call["function"]["name"],
+                        "arguments": function.arguments if function else None
+                    }
+            
+        except Exception as e:
+            logger.error(f"Erreur Groq: {str(e)}")
+            yield {"type": "done", "content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
+            return
+        
+        yield {"type": "done", "content": content, "tool_calls": [tool_calls[i] for i in sorted(tool_calls)] or None}
+    
+    def _ollama_payload(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+            "options": {
+                "temperature": self.temperature
             }
+        }
+        
+        if tools:
+            payload["tools"] = tools
+        
+        return payload
+    
+    async def _astream_ollama_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming Ollama: une ligne JSON (NDJSON) par fragment sur /api/chat"""
+        content = ""
+        tool_calls: List[Dict[str, Any]] = []
+        payload = self._ollama_payload(messages, tools)
+        payload["stream"] = True
+        try:
+            async with self._async_http_client.stream("POST", f"{self.ollama_base_url}/api/chat", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    message = chunk.get("message") or {}
+                    
+                    if message.get("content"):
+                        content += message["content"]
+                        yield {"type": "token", "content": message["content"]}
+                    
+                    # Ollama envoie chaque appel d'outil complet dans un seul fragment
+                    for call in message.get("tool_calls") or []:
+                        tool_calls.append(call)
+                        yield {
+                            "type": "tool_call_delta",
+                            "index": len(tool_calls) - 1,
+                            "name": call["function"]["name"],
+                            "arguments": call["function"].get("arguments")
+                        }
+                    
+                    if chunk.get("done"):
+                        break
             
-            if tools:
-                payload["tools"] = tools
+        except Exception as e:
+            logger.error(f"Erreur Ollama: {str(e)}")
+            yield {"type": "done", "content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
+            return
+        
+        yield {"type": "done", "content": content, "tool_calls": tool_calls or None}
+    
+    def _ollama_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "content": result["message"]["content"],
+            "tool_calls": result["message"].get("tool_calls")
+        }
+    
+    def _create_ollama_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Utilise Ollama pour la completion"""
+        try:
+            url = f"{self.ollama_base_url}/api/chat"
             
-            response = requests.post(
+            response = self.http_session.post(
                 url, 
-                json=payload, 
-                timeout=int(os.getenv("REQUEST_TIMEOUT", 30))
+                json=self._ollama_payload(messages, tools), 
+                timeout=(self.connect_timeout, self.request_timeout)
             )
             response.raise_for_status()
             
-            result = response.json()
+            return self._ollama_result(response.json())
             
-            return {
-                "content": result["message"]["content"],
-                "tool_calls": result["message"].get("tool_calls")
-            }
+        except Exception as e:
+            logger.error(f"Erreur Ollama: {str(e)}")
+            return {"content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
+    
+    async def _acreate_ollama_completion(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Utilise Ollama de façon asynchrone pour la completion"""
+        try:
+            response = await self._async_http_client.post(
+                f"{self.ollama_base_url}/api/chat",
+                json=self._ollama_payload(messages, tools)
+            )
+            response.raise_for_status()
+            
+            return self._ollama_result(response.json())
             
         except Exception as e:
             logger.error(f"Erreur Ollama: {str(e)}")
-            return {"content": f"Erreur: {str(e)}", "tool_calls": None}
\ No newline at end of file
+            return {"content": f"Erreur: {str(e)}", "tool_calls": None, "error": True}
\ No newline at end of file
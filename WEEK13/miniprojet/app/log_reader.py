@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.log_utils import LOG_FILE
+
+# Fragments écrits tels quels par JsonLineFormatter: les guillemets internes aux chaînes
+# étant échappés, ces séquences ne peuvent apparaître qu'au niveau des clés de premier niveau
+TIMESTAMP_PREFIX = b'{"timestamp": "'
+LEVEL_MARKER = b'"level": "'
+TOOL_MARKER = b', "event": "tool_call", "tool": "'
+SUCCESS_MARKER = b'"success": '
+
+READ_CHUNK = 1024 * 1024
+
+class LogSegment:
+    """Index d'un fichier de log (app.log ou une sauvegarde), identifié par son inode"""
+    
+    def __init__(self, inode: int, path: str):
+        self.inode = inode
+        self.path = path
+        self.offset = 0                       # fin de la dernière ligne complète indexée
+        self.offsets = array("q")             # début de chaque ligne
+        self.success = array("b")             # 1 succès, 0 échec, -1 hors appel d'outil
+        self.timestamps: List[Optional[str]] = []
+        self.levels: List[Optional[str]] = []
+        self.tools: List[Optional[str]] = []
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def reset(self):
+        self.__init__(self.inode, self.path)
+
+class LogReader:
+    """Lecture paginée de app.log sans charger le fichier en mémoire.
+    
+    Chaque appel à refresh() reprend la lecture là où la précédente s'était arrêtée et
+    n'indexe que les nouvelles lignes (position, horodatage, niveau, outil, succès).
+    Les fichiers renommés par la rotation conservent leur inode et donc leur index;
+    seules les lignes de la page demandée sont relues et décodées.
+    """
+    
+    def __init__(self, path: Optional[str] = None, backup_count: Optional[int] = None):
+        self.path = path or LOG_FILE
+        self.backup_count = backup_count if backup_count is not None else int(os.getenv("LOG_BACKUP_COUNT", 7))
+        self.segments: List[LogSegment] = []  # du plus ancien au plus récent
+        self._tool_names: set = set()
+        self._lock = threading.Lock()
+    
+    def _files(self) -> Dict[int, Tuple[int, str]]:
+        """inode -> (rang, chemin); rang 0 pour app.log, n pour app.log.n (plus ancien)"""
+        files = {}
+        for rank in range(self.backup_count + 1):
+            path = self.path if rank == 0 else f"{self.path}.{rank}"
+            try:
+                inode = os.stat(path).st_ino
+            except OSError:
+                continue
+            files.setdefault(inode, (rank, path))
+        return files
+    
+    def refresh(self) -> int:
+        """Indexe les lignes écrites depuis le dernier appel; renvoie leur nombre"""
+        with self._lock:
+            files = self._files()
+            
+            # Sauvegardes supprimées par la rotation
+            self.segments = [segment for segment in self.segments if segment.inode in files]
+            known = {segment.inode for segment in self.segments}
+            for inode, (_, path) in files.items():
+                if inode not in known:
+                    self.segments.append(LogSegment(inode, path))
+            for segment in self.segments:
+                segment.path = files[segment.inode][1]
+            self.segments.sort(key=lambda segment: -files[segment.inode][0])
+            
+            return sum(self._tail(segment) for segment in self.segments)
+    
+    def _tail(self, segment: LogSegment) -> int:
+        try:
+            size = os.path.getsize(segment.path)
+        except OSError:
+            return 0
+        if size < segment.offset:
+            # Fichier tronqué ou inode réutilisé: on réindexe depuis le début
+            segment.reset()
+        if size == segment.offset:
+            return 0
+        
+        added = 0
+        with open(segment.path, "rb") as f:
+            f.seek(segment.offset)
+            pending = b""
+            position = segment.offset
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                data = pending + chunk
+                start = 0
+                end = data.find(b"\n")
+                while end != -1:
+                    self._index_line(segment, position + start, data[start:end])
+                    added += 1
+                    start = end + 1
+                    end = data.find(b"\n", start)
+                position += start
+                pending = data[start:]
+            # Une ligne incomplète (écriture en cours) sera indexée au prochain appel
+            segment.offset = position
+        return added
+    
+    def _index_line(self, segment: LogSegment, offset: int, line: bytes):
+        timestamp = level = tool = None
+        success = -1
+        
+        if line.startswith(TIMESTAMP_PREFIX):
+            end = line.find(b'"', len(TIMESTAMP_PREFIX))
+            timestamp = line[len(TIMESTAMP_PREFIX):end].decode("ascii", "replace")
+            
+            start = line.find(LEVEL_MARKER)
+            if start != -1:
+                start += len(LEVEL_MARKER)
+                level = line[start:line.find(b'"', start)].decode("ascii", "replace")
+            
+            start = line.find(TOOL_MARKER)
+            if start != -1:
+                start += len(TOOL_MARKER)
+                tool = sys.intern(line[start:line.find(b'"', start)].decode("utf-8", "replace"))
+                self._tool_names.add(tool)
+                # "success" suit "outputs": la dernière occurrence est celle du premier niveau
+                start = line.rfind(SUCCESS_MARKER)
+                if start != -1:
+                    success = 1 if line.startswith(b"true", start + len(SUCCESS_MARKER)) else 0
+        
+        segment.offsets.append(offset)
+        segment.timestamps.append(timestamp)
+        segment.levels.append(level)
+        segment.tools.append(tool)
+        segment.success.append(success)
+    
+    def tools(self) -> List[str]:
+        """Noms des outils présents dans les logs indexés"""
+        return sorted(self._tool_names)
+    
+    def total(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+    
+    def query(self, tool: Optional[str] = None, success: Optional[bool] = None, level: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              page: int = 0, page_size: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """Renvoie (entrées de la page, nombre total d'entrées filtrées), les plus récentes d'abord.
+        
+        since / until sont des horodatages ISO comparés en tant que chaînes.
+        """
+        wanted_success = -1 if success is None else int(success)
+        first = page * page_size
+        matches = 0
+        selected: List[Tuple[LogSegment, int]] = []
+        
+        with self._lock:
+            for segment in reversed(self.segments):
+                timestamps, levels, tools, flags = segment.timestamps, segment.levels, segment.tools, segment.success
+                for i in range(len(segment) - 1, -1, -1):
+                    if tool is not None and tools[i] != tool:
+                        continue
+                    if success is not None and flags[i] != wanted_success:
+                        continue
+                    if level is not None and levels[i] != level:
+                        continue
+                    if since is not None and (timestamps[i] is None or timestamps[i] < since):
+                        continue
+                    if until is not None and (timestamps[i] is None or timestamps[i] > until):
+                        continue
+                    if first <= matches < first + page_size:
+                        selected.append((segment, i))
+                    matches += 1
+            
+            return self._read(selected), matches
+    
+    @staticmethod
+    def _read(selected: List[Tuple[LogSegment, int]]) -> List[Dict[str, Any]]:
+        """Relit uniquement les lignes sélectionnées"""
+        entries = []
+        handles = {}
+        try:
+            for segment, i in selected:
+                f = handles.get(segment.path)
+                if f is None:
+                    f = handles[segment.path] = open(segment.path, "rb")
+                f.seek(segment.offsets[i])
+                line = f.readline().decode("utf-8", "replace").rstrip("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                entries.append(entry if isinstance(entry, dict) else {"message": line})
+        except OSError:
+            # Fichier supprimé par une rotation entre l'indexation et la lecture
+            pass
+        finally:
+            for f in handles.values():
+                f.close()
+        return entries
@@ -1,19 +1,151 @@
-import logging
+import os
 import sys
 import json
-from typing import Dict, Any
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Dict, Any, Optional
 from datetime import datetime
 
+from app.redaction import Redactor
+
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+
+class JsonLineFormatter(logging.Formatter):
+    """Formate chaque enregistrement en une ligne JSON (JSONL)"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        tool_call = getattr(record, "tool_call", None)
+        if tool_call is not None:
+            entry["event"] = "tool_call"
+            entry.update(tool_call)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Écrit les lignes par lots, avec rotation par taille et par durée (app.log.1, app.log.2, ...)"""
+    
+    def __init__(self, filename: str, max_bytes: int = 0, rotate_interval: float = 0,
+                 backup_count: int = 7, batch_size: int = 50):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.rotate_interval = rotate_interval
+        self.batch_size = batch_size
+        self._buffer = []
+        opened_at = os.path.getmtime(self.baseFilename) if os.path.exists(self.baseFilename) else time.time()
+        self._rotate_at = opened_at + rotate_interval if rotate_interval > 0 else None
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._buffer.append(self.format(record))
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self):
+        self.acquire()
+        try:
+            if not self._buffer:
+                return
+            data = "\n".join(self._buffer) + "\n"
+            self._buffer = []
+            
+            if self.stream is None:
+                self.stream = self._open()
+            if self._needs_rollover(len(data.encode("utf-8"))):
+                self.doRollover()
+                if self.rotate_interval > 0:
+                    self._rotate_at = time.time() + self.rotate_interval
+                if self.stream is None:
+                    self.stream = self._open()
+            
+            self.stream.write(data)
+            self.stream.flush()
+        finally:
+            self.release()
+    
+    def _needs_rollover(self, pending_bytes: int) -> bool:
+        self.stream.seek(0, 2)
+        size = self.stream.tell()
+        if size == 0:
+            return False
+        if self._rotate_at is not None and time.time() >= self._rotate_at:
+            return True
+        return self.maxBytes > 0 and size + pending_bytes > self.maxBytes
+    
+    def close(self):
+        self.flush()
+        super().close()
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """QueueListener qui vide les lots en attente quand la file reste inactive"""
+    
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler, flush_interval: float = 1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+    
+    def dequeue(self, block: bool):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    handler.flush()
+
+_listener: Optional[FlushingQueueListener] = None
+
 def setup_logging():
-    """Configure la journalisation pour l'application"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("app.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
+    """Configure la journalisation pour l'application
+    
+    Les appels de journalisation ne font que déposer l'enregistrement dans une file;
+    un thread dédié écrit app.log (JSONL, par lots, avec rotation) et la sortie standard.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    file_handler = BatchedRotatingFileHandler(
+        LOG_FILE,
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", 50 * 1024 * 1024)),
+        rotate_interval=float(os.getenv("LOG_ROTATE_INTERVAL", 24 * 3600)),
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", 7)),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", 50))
+    )
+    file_handler.setFormatter(JsonLineFormatter())
+    
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    _listener = FlushingQueueListener(
+        log_queue, file_handler, stdout_handler,
+        flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
     )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Vide la file et ferme les fichiers de journalisation"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
 
 # Configuration initiale
 setup_logging()
@@ -21,44 +153,31 @@ setup_logging()
 # Logger principal
 logger = logging.getLogger("mcp_research_app")
 
-def log_tool_call(tool_name: str, inputs: Dict[str, Any], outputs: Dict[str, Any], success: bool = True):
-    """Journalise un appel d'outil avec ses entrées et sorties"""
+# Masquage des secrets et troncature des longues chaînes avant journalisation
+_redactor = Redactor.from_env()
+
+def log_tool_call(tool_name: str, inputs: Dict[str, Any], outputs: Dict[str, Any], success: bool = True,
+                  elapsed_s: Optional[float] = None, attempts: Optional[int] = None):
+    """Journalise un appel d'outil (un seul enregistrement par appel) avec ses entrées et sorties"""
     # Nettoyage des données sensibles
     sanitized_inputs = sanitize_log_data(inputs)
     sanitized_outputs = sanitize_log_data(outputs)
     
     log_entry = {
-        "timestamp": datetime.now().isoformat(),
         "tool": tool_name,
         "inputs": sanitized_inputs,
         "outputs": sanitized_outputs,
-        "success": success
+        "success": success,
+        "elapsed_s": round(elapsed_s, 3) if elapsed_s is not None else None,
+        "attempts": attempts
     }
     
+    # La sérialisation JSON se fait dans le thread d'écriture, hors du chemin de la requête
     if success:
-        logger.info(f"Appel d'outil: {json.dumps(log_entry, default=str)}")
+        logger.info(f"Appel d'outil: {tool_name} ({log_entry['elapsed_s']}s)", extra={"tool_call": log_entry})
     else:
-        logger.error(f"Échec d'appel d'outil: {json.dumps(log_entry, default=str)}")
+        logger.error(f"Échec d'appel d'outil: {tool_name} ({log_entry['elapsed_s']}s)", extra={"tool_call": log_entry})
 
-def sanitize_log_data(data: Dict[str, Any]) -> Dict[str, Any]:
+def sanitize_log_data(data: Any) -> Any:
     """Nettoie les données de journalisation pour enlever les informations sensibles"""
-    if not isinstance(data, dict):
-        return data
-    
-    sanitized = data.copy()
-    
-    # Liste des champs potentiellement sensibles
-    sensitive_fields = ['api_key', 'password', 'secret', 'token', 'key', 'credentials']
-    
-    for field in sensitive_fields:
-        if field in sanitized:
-            sanitized[field] = '***REDACTED***'
-    
-    # Nettoyage récursif des sous-dictionnaires
-    for key, value in sanitized.items():
-        if isinstance(value, dict):
-            sanitized[key] = sanitize_log_data(value)
-        elif isinstance(value, list):
-            sanitized[key] = [sanitize_log_data(item) if isinstance(item, dict) else item for item in value]
-    
-    return sanitized
\ No newline at end of file
+    return _redactor.redact(data)
\ No newline at end of file
@@ -2,12 +2,16 @@ import os
 import json
 import asyncio
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
 from app.llm_client import LLMClient
 from app.log_utils import logger, log_tool_call
+from app.session_pool import MCPSessionPool
+from app.tool_catalog import ToolCatalog
+from app.context_window import ContextWindow
+from app.retry_policy import RetryPolicy, CircuitBreaker, NonRetryableToolError
 
 class MCPOrchestrator:
     def __init__(self):
@@ -15,47 +19,162 @@ class MCPOrchestrator:
         self.sessions = {}
         self.available_tools = []
         self.max_retries = int(os.getenv("MAX_RETRIES", 3))
+        self.retry_policy = RetryPolicy(self.max_retries)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.server_concurrency = int(os.getenv("MCP_SERVER_CONCURRENCY", 2))
+        self._server_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.parallel_startup = os.getenv("MCP_PARALLEL_STARTUP", "true").lower() in ("1", "true", "yes")
+        self.startup_timeout = float(os.getenv("MCP_STARTUP_TIMEOUT", 30))
+        self.startup_timings = {}
+        self.server_configs = {}
+        self.server_tools = {}
+        self._server_tasks = {}
+        self._server_stops = {}
+        self._pool = None
+        self.tool_catalog = ToolCatalog()
+    
+    @property
+    def pool(self) -> MCPSessionPool:
+        """Pool de sessions persistant, créé à la première utilisation"""
+        if self._pool is None:
+            self._pool = MCPSessionPool(self)
+        return self._pool
+    
+    def _load_server_configs(self) -> List[Dict]:
+        """Lit la déclaration des serveurs MCP"""
+        with open("config/mcp_servers.json", "r") as f:
+            config = json.load(f)
+        return config["servers"]
     
     async def initialize_servers(self):
         """Initialise tous les serveurs MCP configurés"""
         try:
-            with open("config/mcp_servers.json", "r") as f:
-                config = json.load(f)
-            
-            for server_config in config["servers"]:
-                server_name = server_config["name"]
-                logger.info(f"Initialisation du serveur {server_name}")
-                
-                # Configuration du serveur
-                server_params = StdioServerParameters(
-                    command=server_config["command"],
-                    args=server_config["args"],
-                    env=server_config.get("env", {})
-                )
-                
-                # Connexion au serveur
-                session = await stdio_client(server_params)
-                await session.initialize()
-                
-                # Liste des outils disponibles
-                tools_response = await session.list_tools()
-                for tool in tools_response.tools:
-                    tool_info = {
-                        "name": f"{server_name}.{tool.name}",
-                        "description": tool.description,
-                        "inputSchema": tool.inputSchema
-                    }
-                    self.available_tools.append(tool_info)
-                
-                self.sessions[server_name] = session
-                logger.info(f"Serveur {server_name} initialisé avec {len(tools_response.tools)} outils")
-                
+            server_configs = self._load_server_configs()
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation des serveurs: {str(e)}")
             raise
+        self.server_configs = {c["name"]: c for c in server_configs}
+        
+        if self.parallel_startup:
+            # Démarrage simultané: un serveur lent ou en panne ne bloque pas les autres
+            await asyncio.gather(*(self._start_server(c) for c in server_configs))
+            if not self.sessions:
+                raise RuntimeError("Aucun serveur MCP n'a pu être initialisé")
+        else:
+            for server_config in server_configs:
+                if not await self._start_server(server_config):
+                    error = self.startup_timings[server_config["name"]]["error"]
+                    raise RuntimeError(f"Erreur lors de l'initialisation des serveurs: {error}")
+        
+        logger.info(f"Temps de démarrage des serveurs: {json.dumps(self.startup_timings)}")
+    
+    async def _start_server(self, server_config: Dict) -> bool:
+        """Démarre un serveur MCP avec une échéance et enregistre son temps de démarrage"""
+        server_name = server_config["name"]
+        logger.info(f"Initialisation du serveur {server_name}")
+        
+        # Un serveur déjà lancé est remplacé, ses outils ne sont pas dupliqués
+        await self._stop_server(server_name)
+        
+        ready = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        task = asyncio.create_task(self._run_server(server_config, ready, stop))
+        
+        try:
+            session, tools = await asyncio.wait_for(asyncio.shield(ready), self.startup_timeout)
+        except Exception as e:
+            task.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                error = f"délai de démarrage dépassé ({self.startup_timeout}s)"
+            else:
+                error = str(e)
+            self.startup_timings[server_name] = {
+                "status": "failed",
+                "elapsed_s": round(time.perf_counter() - started, 3),
+                "error": error
+            }
+            logger.error(f"Échec de l'initialisation du serveur {server_name}: {error}")
+            return False
+        
+        self.server_tools[server_name] = [
+            {
+                "name": f"{server_name}.{tool.name}",
+                "description": tool.description,
+                "inputSchema": tool.inputSchema
+            }
+            for tool in tools
+        ]
+        self._rebuild_tool_list()
+        self.sessions[server_name] = session
+        self._server_tasks[server_name] = task
+        self._server_stops[server_name] = stop
+        self.startup_timings[server_name] = {
+            "status": "ready",
+            "elapsed_s": round(time.perf_counter() - started, 3),
+            "tools": len(tools)
+        }
+        logger.info(f"Serveur {server_name} initialisé avec {len(tools)} outils")
+        return True
+    
+    async def _stop_server(self, server_name: str):
+        """Arrête un serveur et retire ses outils"""
+        stop = self._server_stops.pop(server_name, None)
+        task = self._server_tasks.pop(server_name, None)
+        self.sessions.pop(server_name, None)
+        if self.server_tools.pop(server_name, None) is not None:
+            self._rebuild_tool_list()
+        
+        if stop is not None:
+            stop.set()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def restart_server(self, server_name: str) -> bool:
+        """Relance un serveur à partir de sa configuration"""
+        logger.warning(f"Reconnexion du serveur {server_name}")
+        return await self._start_server(self.server_configs[server_name])
+    
+    def is_server_alive(self, server_name: str) -> bool:
+        """Indique si la connexion stdio du serveur est toujours ouverte"""
+        task = self._server_tasks.get(server_name)
+        return server_name in self.sessions and task is not None and not task.done()
+    
+    def _rebuild_tool_list(self):
+        self.available_tools = [t for server_tools in self.server_tools.values() for t in server_tools]
+    
+    async def _run_server(self, server_config: Dict, ready: asyncio.Future, stop: asyncio.Event):
+        """Maintient la connexion stdio d'un serveur ouverte jusqu'à la demande d'arrêt"""
+        # Configuration du serveur
+        server_params = StdioServerParameters(
+            command=server_config["command"],
+            args=server_config["args"],
+            env=server_config.get("env", {})
+        )
+        
+        try:
+            # Les contextes stdio doivent être ouverts et fermés dans la même tâche
+            async with stdio_client(server_params) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    
+                    # Liste des outils disponibles
+                    tools_response = await session.list_tools()
+                    ready.set_result((session, tools_response.tools))
+                    
+                    await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"Serveur {server_config['name']} arrêté: {str(e)}")
     
     async def execute_tool(self, tool_name: str, arguments: Dict) -> Dict:
         """Exécute un outil MCP avec gestion des erreurs"""
+        started = time.perf_counter()
+        attempts = 0
+        output: Dict = {}
+        error = None
         try:
             # Extraction du nom du serveur et de l'outil
             server_name, actual_tool_name = tool_name.split(".", 1)
@@ -63,33 +182,63 @@ class MCPOrchestrator:
             if server_name not in self.sessions:
                 raise ValueError(f"Serveur {server_name} non connecté")
             
+            # Un appel mal formé échoue immédiatement au lieu d'épuiser les tentatives
+            self._validate_tool_call(tool_name, arguments)
+            
             session = self.sessions[server_name]
+            breaker = self.breakers.setdefault(server_name, self.retry_policy.new_breaker())
+            semaphore = self._server_semaphores.setdefault(server_name, asyncio.Semaphore(self.server_concurrency))
             
-            # Journalisation de l'appel
-            log_tool_call(tool_name, arguments, {}, False)
+            async def call():
+                nonlocal attempts
+                attempts += 1
+                # Limite les appels simultanés vers un même serveur stdio
+                async with semaphore:
+                    return await session.call_tool(actual_tool_name, arguments)
             
-            # Exécution avec retries
-            for attempt in range(self.max_retries):
-                try:
-                    result = await session.call_tool(actual_tool_name, arguments)
-                    
-                    # Conversion du résultat en format utilisable
-                    output = self._format_tool_result(result)
-                    
-                    # Journalisation du succès
-                    log_tool_call(tool_name, arguments, output, True)
-                    
-                    return output
-                    
-                except Exception as e:
-                    if attempt == self.max_retries - 1:
-                        raise
-                    logger.warning(f"Tentative {attempt + 1} échouée, réessai dans 1s: {str(e)}")
-                    time.sleep(1)
-                    
+            # Exécution avec retries (backoff exponentiel, sans bloquer la boucle); seules les
+            # erreurs de transport et les délais dépassés sont réessayés et comptent pour le disjoncteur
+            result = await self.retry_policy.call(tool_name, call, breaker)
+            
+            # Erreur rapportée par l'outil (fichier absent...): le serveur a répondu, un nouvel essai
+            # échouerait de la même façon
+            if getattr(result, "isError", False):
+                raise NonRetryableToolError(self._format_tool_result(result).get("text", "Erreur de l'outil"))
+            
+            # Conversion du résultat en format utilisable
+            output = self._format_tool_result(result)
+            return output
+        
+        except asyncio.CancelledError:
+            # Annulation (job interrompu, arrêt du pool): journalisée comme un échec puis propagée
+            error = "cancelled"
+            raise
+        
         except Exception as e:
-            logger.error(f"Erreur lors de l'exécution de {tool_name}: {str(e)}")
-            return {"error": str(e), "status": "failed"}
+            error = str(e)
+            return {"error": error, "status": "failed"}
+        
+        finally:
+            # Un seul enregistrement par appel, succès ou échec
+            log_tool_call(
+                tool_name, arguments, output if error is None else {"error": error}, error is None,
+                elapsed_s=time.perf_counter() - started, attempts=attempts
+            )
+    
+    def _validate_tool_call(self, tool_name: str, arguments: Dict):
+        """Vérifie que l'outil existe et que les arguments respectent son schéma"""
+        server_name = tool_name.split(".", 1)[0]
+        tool = next((t for t in self.server_tools.get(server_name, []) if t["name"] == tool_name), None)
+        if tool is None:
+            raise NonRetryableToolError(f"Outil inconnu: {tool_name}")
+        
+        if not isinstance(arguments, dict):
+            raise NonRetryableToolError(f"Arguments invalides pour {tool_name}: objet attendu")
+        
+        schema = tool.get("inputSchema") or {}
+        missing = [name for name in schema.get("required", []) if name not in arguments]
+        if missing:
+            raise NonRetryableToolError(f"Arguments manquants pour {tool_name}: {', '.join(missing)}")
     
     def _format_tool_result(self, result) -> Dict:
         """Formate le résultat d'un outil MCP"""
@@ -107,15 +256,36 @@ class MCPOrchestrator:
         
         return formatted
     
-    async def plan_and_execute(self, user_query: str) -> str:
-        """Planifie et exécute une requête utilisateur"""
+    async def _complete(self, messages: List[Dict], tools: Optional[List[Dict]], step: Any,
+                        on_event: Optional[Callable[[Dict], None]]) -> Dict[str, Any]:
+        """Completion LLM, diffusée à on_event jeton par jeton si un callback est fourni"""
+        if on_event is None:
+            return await self.llm_client.acreate_completion(messages, tools)
+        
+        response = {"content": "", "tool_calls": None}
+        async for event in self.llm_client.astream_completion(messages, tools):
+            if event["type"] == "done":
+                response = {"content": event["content"], "tool_calls": event["tool_calls"]}
+            else:
+                on_event({**event, "step": step})
+        return response
+    
+    async def plan_and_execute(self, user_query: str, on_event: Optional[Callable[[Dict], None]] = None) -> str:
+        """Planifie et exécute une requête utilisateur
+        
+        on_event reçoit au fil de l'eau les jetons et appels d'outils de chaque étape, puis
+        le résultat de chaque outil ("step" vaut "plan" puis le numéro de l'étape).
+        """
+        # Le catalogue n'est resérialisé que si les serveurs ont changé
+        self.tool_catalog.refresh(self.server_configs, self.available_tools)
+        
         # Étape 1: Planification avec le LLM
         plan_prompt = f"""
         En tant qu'assistant de recherche, planifiez l'exécution de cette requête:
         {user_query}
         
         Outils disponibles:
-        {json.dumps(self.available_tools, indent=2)}
+        {self.tool_catalog.prompt_text}
         
         Créez un plan étape par étape. Pour chaque étape, spécifiez:
         1. L'outil à utiliser
@@ -123,10 +293,10 @@ class MCPOrchestrator:
         3. Le but de cette étape
         """
         
-        plan_response = self.llm_client.create_completion([
+        plan_response = await self._complete([
             {"role": "system", "content": "Vous êtes un planificateur expert pour la recherche académique."},
             {"role": "user", "content": plan_prompt}
-        ])
+        ], None, "plan", on_event)
         
         plan = plan_response.get("content", "")
         logger.info(f"Plan généré: {plan}")
@@ -144,7 +314,9 @@ class MCPOrchestrator:
         - reasoning: raisonnement pour ce choix
         """
         
-        context = []
+        # Historique borné: résultats anciens résumés, résultats récents intacts
+        context = ContextWindow()
+        called = set()
         max_steps = 10
         
         for step in range(max_steps):
@@ -153,34 +325,55 @@ class MCPOrchestrator:
                 {"role": "system", "content": "Vous exécutez un plan de recherche. Choisissez la prochaine action."},
                 {"role": "user", "content": execution_prompt}
             ]
-            messages.extend(context)
+            context_messages = context.messages()
+            messages.extend(context_messages)
             
-            response = self.llm_client.create_completion(messages, self.available_tools)
+            # Avec TOOL_CATALOG_MAX_TOOLS, seuls les outils pertinents pour la requête et les derniers
+            # résultats sont envoyés, plus ceux déjà appelés
+            step_text = " ".join([user_query] + [m["content"] for m in context_messages[-2:]])
+            response = await self._complete(messages, self.tool_catalog.select(step_text, called=called), step, on_event)
             
             if response.get("tool_calls"):
-                # Exécuter les appels d'outils
-                for tool_call in response["tool_calls"]:
-                    tool_name = tool_call["function"]["name"]
-                    arguments = json.loads(tool_call["function"]["arguments"])
-                    
-                    result = await self.execute_tool(tool_name, arguments)
-                    
-                    # Ajouter au contexte
-                    context.append({
-                        "role": "assistant", 
-                        "content": f"Exécution de {tool_name} avec {arguments}"
-                    })
-                    context.append({
-                        "role": "user", 
-                        "content": f"Résultat: {json.dumps(result, indent=2)}"
-                    })
+                # Exécuter les appels d'outils indépendants du même tour en parallèle
+                calls = [self._parse_tool_call(tool_call) for tool_call in response["tool_calls"]]
+                results = await asyncio.gather(
+                    *(self.execute_tool(tool_name, arguments) for tool_name, arguments in calls)
+                )
+                
+                # Ajouter au contexte dans l'ordre des appels proposés par le LLM
+                for (tool_name, arguments), result in zip(calls, results):
+                    called.add(tool_name)
+                    context.add(tool_name, arguments, result)
+                    if on_event is not None:
+                        on_event({"type": "tool_result", "step": step, "name": tool_name, "success": "error" not in result})
             else:
                 # Plus d'actions, retourner le résultat final
                 return response.get("content", "Exécution terminée")
         
         return "Nombre maximum d'étapes atteint. Exécution terminée."
     
+    def _parse_tool_call(self, tool_call) -> Tuple[str, Dict]:
+        """Extrait le nom et les arguments d'un appel d'outil (dict Ollama ou objet Groq)"""
+        function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+        if isinstance(function, dict):
+            tool_name, arguments = function["name"], function.get("arguments", {})
+        else:
+            tool_name, arguments = function.name, function.arguments
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments) if arguments else {}
+        return tool_name, arguments
+    
     async def close(self):
         """Ferme toutes les sessions MCP"""
-        for session in self.sessions.values():
-            await session.close()
\ No newline at end of file
+        pool = self._pool
+        if pool is not None and pool.running and not pool.in_pool_thread():
+            # Les sessions vivent dans la boucle du pool: c'est lui qui les ferme
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+        else:
+            await self.close_sessions()
+        self.llm_client.close()
+    
+    async def close_sessions(self):
+        """Arrête tous les serveurs MCP de la boucle courante"""
+        await asyncio.gather(*(self._stop_server(name) for name in list(self._server_tasks)))
+        await self.llm_client.aclose()
@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Any, Dict, Iterable, Optional
+
+# Noms de champs sensibles (insensible à la casse, recherchés dans tout le nom);
+# "token" est ancré pour laisser passer les compteurs max_tokens, tokens_in, spec_tokens...
+DEFAULT_KEY_PATTERNS = [
+    r"api[_-]?key", r"password", r"passwd", r"secret", r"(^|[_-])(access|refresh|auth|id)?[_-]?token$", r"credential",
+    r"authorization", r"cookie", r"^key$"
+]
+
+# Valeurs qui ressemblent à des secrets, quel que soit le nom du champ
+DEFAULT_VALUE_PATTERNS = [
+    r"gsk_[A-Za-z0-9]{20,}",                       # clé Groq
+    r"sk-[A-Za-z0-9_-]{20,}",                      # clé de type OpenAI
+    r"[Bb]earer\s+[A-Za-z0-9._~+/-]+=*",          # en-tête Authorization
+    r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"  # JWT
+]
+
+REDACTED = "***REDACTED***"
+
+# Caractères examinés au-delà de max_string: plus long que les secrets reconnus
+SCAN_MARGIN = 128
+
+SCALAR_TYPES = frozenset((int, float, bool, type(None)))
+CONTAINER_TYPES = (dict, list, tuple)
+
+class Redactor:
+    """Moteur de masquage compilé: un seul parcours, structures imbriquées sans limite de profondeur"""
+    
+    def __init__(self, key_patterns: Optional[Iterable[str]] = None, value_patterns: Optional[Iterable[str]] = None,
+                 max_string: Optional[int] = None, max_items: Optional[int] = None):
+        key_patterns = list(key_patterns or DEFAULT_KEY_PATTERNS)
+        value_patterns = list(value_patterns or DEFAULT_VALUE_PATTERNS)
+        self.key_regex = re.compile("|".join(f"(?:{p})" for p in key_patterns), re.IGNORECASE)
+        self.value_regex = re.compile("|".join(f"(?:{p})" for p in value_patterns))
+        self.max_string = max_string or int(os.getenv("LOG_MAX_STRING", 2000))
+        self.max_items = max_items or int(os.getenv("LOG_MAX_ITEMS", 200))
+        self._key_cache: Dict[str, bool] = {}
+    
+    @classmethod
+    def from_env(cls) -> "Redactor":
+        """Motifs par défaut complétés par LOG_REDACT_KEYS / LOG_REDACT_VALUES (séparés par des virgules)"""
+        extra_keys = [p for p in os.getenv("LOG_REDACT_KEYS", "").split(",") if p.strip()]
+        extra_values = [p for p in os.getenv("LOG_REDACT_VALUES", "").split(",") if p.strip()]
+        return cls(DEFAULT_KEY_PATTERNS + extra_keys, DEFAULT_VALUE_PATTERNS + extra_values)
+    
+    def is_sensitive_key(self, key: Any) -> bool:
+        sensitive = self._key_cache.get(key)
+        if sensitive is None:
+            if len(self._key_cache) > 10000:
+                self._key_cache.clear()
+            sensitive = self._key_cache[key] = isinstance(key, str) and self.key_regex.search(key) is not None
+        return sensitive
+    
+    def redact_string(self, value: str) -> str:
+        # Seul le préfixe conservé est examiné et copié, jamais la chaîne entière; la fenêtre
+        # examinée déborde de SCAN_MARGIN pour qu'un secret coupé par la troncature soit reconnu
+        if len(value) > self.max_string:
+            suffix = f"… [{len(value)} caractères]"
+            window = value[:self.max_string + SCAN_MARGIN]
+            if self.value_regex.search(window) is not None:
+                window = self.value_regex.sub(REDACTED, window)
+            return window[:self.max_string] + suffix
+        if self.value_regex.search(value) is not None:
+            value = self.value_regex.sub(REDACTED, value)
+        return value
+    
+    def redact(self, data: Any) -> Any:
+        """Renvoie une version masquée et tronquée de data, construite en un seul parcours"""
+        # Références locales: cette boucle est le chemin chaud de chaque appel journalisé
+        key_cache = self._key_cache
+        is_sensitive_key = self.is_sensitive_key
+        redact_string = self.redact_string
+        max_items = self.max_items
+        
+        root = [None]
+        stack = [(data, root, 0)]
+        push, pop = stack.append, stack.pop
+        
+        while stack:
+            value, parent, slot = pop()
+            
+            if isinstance(value, dict):
+                out = {}
+                parent[slot] = out
+                for key, item in value.items():
+                    sensitive = key_cache.get(key)
+                    if sensitive is None:
+                        sensitive = is_sensitive_key(key)
+                    kind = type(item)
+                    if sensitive:
+                        out[key] = REDACTED
+                    elif kind in SCALAR_TYPES:
+                        out[key] = item
+                    elif isinstance(item, str):
+                        out[key] = redact_string(item)
+                    elif isinstance(item, CONTAINER_TYPES):
+                        out[key] = None
+                        push((item, out, key))
+                    else:
+                        out[key] = item
+            
+            elif isinstance(value, CONTAINER_TYPES):
+                # Les longues listes sont tronquées: seuls les premiers éléments sont parcourus
+                if len(value) > max_items:
+                    out = list(value[:max_items])
+                    out.append(f"… [{len(value)} éléments]")
+                else:
+                    out = list(value)
+                parent[slot] = out
+                for index, item in enumerate(out):
+                    kind = type(item)
+                    if kind in SCALAR_TYPES:
+                        continue
+                    if isinstance(item, str):
+                        out[index] = redact_string(item)
+                    elif isinstance(item, CONTAINER_TYPES):
+                        push((item, out, index))
+            
+            elif isinstance(value, str):
+                parent[slot] = redact_string(value)
+            
+            else:
+                parent[slot] = value
+        
+        return root[0]
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.log_utils import logger
+
+# Codes JSON-RPC qui ne peuvent pas réussir en réessayant
+NON_RETRYABLE_CODES = {-32600, -32601, -32602}  # requête invalide, méthode inconnue, paramètres invalides
+
+# Messages d'erreur renvoyés par les serveurs MCP pour un appel mal formé
+NON_RETRYABLE_MESSAGES = ("unknown tool", "outil inconnu", "validation error", "invalid arguments", "missing required")
+
+class NonRetryableToolError(Exception):
+    """Erreur d'appel d'outil qui échouerait à chaque tentative"""
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur du serveur est ouvert, l'appel n'est pas tenté"""
+
+def is_retryable(error: Exception) -> bool:
+    """Classe une erreur: True si un nouvel essai peut réussir"""
+    if isinstance(error, (NonRetryableToolError, CircuitOpenError, ValueError, TypeError, KeyError)):
+        return False
+    
+    code = getattr(getattr(error, "error", None), "code", None)
+    if code in NON_RETRYABLE_CODES:
+        return False
+    
+    message = str(error).lower()
+    return not any(marker in message for marker in NON_RETRYABLE_MESSAGES)
+
+class CircuitBreaker:
+    """Disjoncteur par serveur: coupe les appels après une série d'échecs"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # En demi-ouverture, un seul appel d'essai à la fois; les autres restent bloqués
+        self._probe_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout and not self._probe_in_flight:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        """Autorise l'appel sauf si le disjoncteur est ouvert; en demi-ouverture, seul le premier passe"""
+        state = self.state
+        if state == "half_open":
+            self._probe_in_flight = True
+        return state != "open"
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        # En demi-ouverture, un seul échec suffit à rouvrir le disjoncteur
+        if self._probe_in_flight or self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+    
+    def release_probe(self):
+        """Appel d'essai terminé sans verdict (erreur non transitoire, annulation): un autre pourra essayer"""
+        self._probe_in_flight = False
+
+class RetryPolicy:
+    """Réessais asynchrones avec backoff exponentiel, jitter et budget par outil"""
+    
+    def __init__(self, max_retries: Optional[int] = None):
+        self.max_retries = max_retries or int(os.getenv("MAX_RETRIES", 3))
+        self.base_delay = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+        self.max_delay = float(os.getenv("RETRY_MAX_DELAY", 8))
+        # Ex: TOOL_RETRY_BUDGETS='{"arxiv.search_papers": 5, "filesystem.write_file": 1}'
+        self.tool_budgets: Dict[str, int] = json.loads(os.getenv("TOOL_RETRY_BUDGETS", "{}"))
+        self.breaker_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.breaker_reset = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+    
+    def attempts_for(self, tool_name: str) -> int:
+        """Nombre maximal de tentatives pour un outil"""
+        return max(1, int(self.tool_budgets.get(tool_name, self.max_retries)))
+    
+    def backoff(self, attempt: int) -> float:
+        """Délai avant la tentative suivante (full jitter)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+    
+    def new_breaker(self) -> CircuitBreaker:
+        return CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+    
+    async def call(self, tool_name: str, operation: Callable[[], Awaitable[Any]], breaker: CircuitBreaker) -> Any:
+        """Exécute l'opération en réessayant les erreurs transitoires sans bloquer la boucle"""
+        attempts = self.attempts_for(tool_name)
+        
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Disjoncteur ouvert pour {tool_name.split('.', 1)[0]}")
+            
+            try:
+                result = await operation()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+                if not retryable or attempt == attempts - 1:
+                    raise
+                
+                delay = self.backoff(attempt)
+                logger.warning(f"Tentative {attempt + 1} échouée, réessai dans {delay:.2f}s: {str(e)}")
+                await asyncio.sleep(delay)
+            except BaseException:
+                breaker.release_probe()
+                raise
+            else:
+                breaker.record_success()
+                return result
@@ -0,0 +1,131 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+from app.log_utils import logger
+
+class MCPSessionPool:
+    """Garde les sessions MCP ouvertes entre les requêtes sur une boucle d'événements dédiée"""
+    
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self.health_check_interval = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", 30))
+        self.ping_timeout = float(os.getenv("MCP_PING_TIMEOUT", 5))
+        self.max_reconnect_delay = float(os.getenv("MCP_MAX_RECONNECT_DELAY", 600))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready_lock: Optional[asyncio.Lock] = None
+        self._initialized = False
+        self._last_check = 0.0
+        self._failures = {}
+        self._retry_at = {}
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def in_pool_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+    
+    def start(self):
+        """Démarre la boucle d'événements du pool si nécessaire"""
+        with self._lock:
+            if self.running:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._ready_lock = None
+            self._initialized = False
+            self._thread = threading.Thread(target=self._run_loop, name="mcp-session-pool", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+    
+    def submit(self, coro: Coroutine) -> Future:
+        """Planifie une coroutine sur la boucle du pool, avec des sessions prêtes"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._with_ready_sessions(coro), self._loop)
+    
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Exécute une coroutine sur la boucle du pool et attend son résultat"""
+        return self.submit(coro).result(timeout)
+    
+    async def _with_ready_sessions(self, coro: Coroutine) -> Any:
+        try:
+            await self.ensure_ready()
+        except BaseException:
+            coro.close()
+            raise
+        return await coro
+    
+    async def ensure_ready(self):
+        """Initialise les serveurs au premier appel, puis vérifie leur état périodiquement"""
+        if self._ready_lock is None:
+            self._ready_lock = asyncio.Lock()
+        
+        async with self._ready_lock:
+            if not self._initialized:
+                await self.orchestrator.initialize_servers()
+                self._initialized = True
+                self._last_check = time.monotonic()
+                for name in self.orchestrator.server_configs:
+                    if not self.orchestrator.is_server_alive(name):
+                        self._schedule_retry(name)
+                return
+            
+            now = time.monotonic()
+            due = [name for name in self.orchestrator.server_configs
+                   if not self.orchestrator.is_server_alive(name) and now >= self._retry_at.get(name, 0)]
+            if due or now - self._last_check >= self.health_check_interval:
+                await self.health_check()
+    
+    async def health_check(self):
+        """Ping chaque serveur et reconnecte ceux qui ne répondent plus"""
+        async def check(name: str):
+            if self.orchestrator.is_server_alive(name):
+                try:
+                    await asyncio.wait_for(self.orchestrator.sessions[name].send_ping(), self.ping_timeout)
+                    return
+                except Exception as e:
+                    logger.warning(f"Serveur {name} ne répond pas au ping: {str(e)}")
+            
+            # Un serveur qui échoue à redémarrer n'est retenté qu'après un délai croissant
+            if time.monotonic() < self._retry_at.get(name, 0):
+                return
+            if await self.orchestrator.restart_server(name):
+                self._failures.pop(name, None)
+                self._retry_at.pop(name, None)
+            else:
+                self._schedule_retry(name)
+        
+        await asyncio.gather(*(check(name) for name in self.orchestrator.server_configs))
+        self._last_check = time.monotonic()
+    
+    def _schedule_retry(self, name: str):
+        self._failures[name] = self._failures.get(name, 0) + 1
+        delay = min(self.health_check_interval * 2 ** (self._failures[name] - 1), self.max_reconnect_delay)
+        self._retry_at[name] = time.monotonic() + delay
+    
+    def shutdown(self, timeout: float = 10):
+        """Ferme les sessions puis arrête la boucle du pool"""
+        if not self.running or self.in_pool_thread():
+            return
+        
+        future = asyncio.run_coroutine_threadsafe(self.orchestrator.close_sessions(), self._loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            logger.error(f"Erreur lors de la fermeture des sessions MCP: {str(e)}")
+        
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+WORD_PATTERN = re.compile(r"[a-zà-ÿ0-9]{3,}")
+
+# Mots vides (français, anglais) ignorés par le score de pertinence: "les", "une" ou "the"
+# ne disent rien de l'outil à utiliser
+STOPWORDS = frozenset("""
+les des une aux ces cet cette son sa ses leur leurs nos vos mes pour par avec sans dans sur sous
+entre vers chez qui que quoi dont est sont été être avoir fait faire plus moins tout tous toute toutes
+très bien aussi mais donc car puis comme ainsi elle ils elles nous vous
+the and for with from into onto that this these those are was were been has have had not but
+any all can may its their them then than which what when where who will would should
+""".split())
+
+class ToolCatalog:
+    """Catalogue des outils MCP sérialisé une seule fois par session"""
+    
+    def __init__(self, description_budget: Optional[int] = None, max_tools: Optional[int] = None,
+                 min_score: Optional[int] = None):
+        self.description_budget = description_budget or int(os.getenv("TOOL_DESCRIPTION_BUDGET", 160))
+        # 0: tous les outils à chaque étape; sinon au plus max_tools outils pertinents (plus ceux gardés d'office)
+        self.max_tools = max_tools if max_tools is not None else int(os.getenv("TOOL_CATALOG_MAX_TOOLS", 0))
+        self.min_score = min_score or int(os.getenv("TOOL_CATALOG_MIN_SCORE", 1))
+        self.key: Optional[str] = None
+        self.tools: List[Dict[str, Any]] = []
+        self.prompt_text = "[]"
+        self._keywords: List[set] = []
+    
+    @staticmethod
+    def compute_key(server_configs: Dict[str, Dict], available_tools: List[Dict]) -> str:
+        """Empreinte des configurations serveurs et des outils exposés"""
+        payload = json.dumps(
+            [server_configs, sorted(t["name"] for t in available_tools)],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def refresh(self, server_configs: Dict[str, Dict], available_tools: List[Dict]) -> bool:
+        """Reconstruit le catalogue si les serveurs ont changé; renvoie True si reconstruit"""
+        key = self.compute_key(server_configs, available_tools)
+        if key == self.key:
+            return False
+        
+        self.tools = [
+            {
+                "name": tool["name"],
+                "description": self._trim(tool.get("description") or ""),
+                "inputSchema": self._compact_schema(tool.get("inputSchema") or {})
+            }
+            for tool in available_tools
+        ]
+        # Forme minifiée pour le prompt de planification
+        self.prompt_text = json.dumps(self.tools, ensure_ascii=False, separators=(",", ":"))
+        self._keywords = [self._words(f"{t['name']} {t['description']}".replace(".", " ").replace("_", " ")) for t in self.tools]
+        self.key = key
+        return True
+    
+    def select(self, text: str, limit: Optional[int] = None, called: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Outils les plus pertinents pour l'étape courante (tous si le filtre est désactivé
+        ou si aucun n'atteint min_score).
+        
+        Le meilleur outil de chaque serveur et les outils déjà appelés pendant le run sont
+        toujours gardés, même au-delà de limit.
+        """
+        limit = self.max_tools if limit is None else limit
+        if not limit or len(self.tools) <= limit:
+            return self.tools
+        
+        words = self._words(text)
+        scores = [len(words & keywords) for keywords in self._keywords]
+        ranked = sorted(range(len(self.tools)), key=lambda index: (-scores[index], index))
+        relevant = [index for index in ranked if scores[index] >= self.min_score]
+        if not relevant:
+            return self.tools
+        
+        called = set(called)
+        keep = {index for index, tool in enumerate(self.tools) if tool["name"] in called}
+        best_by_server: Dict[str, int] = {}
+        for index in ranked:
+            best_by_server.setdefault(self.tools[index]["name"].split(".", 1)[0], index)
+        keep.update(best_by_server.values())
+        for index in relevant:
+            if len(keep) >= limit:
+                break
+            keep.add(index)
+        
+        # Conserve l'ordre du catalogue pour des prompts stables
+        return [self.tools[index] for index in sorted(keep)]
+    
+    def _trim(self, text: str) -> str:
+        text = " ".join(text.split())
+        if len(text) <= self.description_budget:
+            return text
+        return text[:self.description_budget].rsplit(" ", 1)[0] + "…"
+    
+    def _compact_schema(self, schema: Any) -> Any:
+        """Retire les titres et raccourcit les descriptions des paramètres"""
+        if isinstance(schema, dict):
+            compact = {}
+            for key, value in schema.items():
+                if key == "title" and isinstance(value, str):
+                    continue
+                if key == "description" and isinstance(value, str):
+                    compact[key] = self._trim(value)
+                else:
+                    compact[key] = self._compact_schema(value)
+            return compact
+        if isinstance(schema, list):
+            return [self._compact_schema(item) for item in schema]
+        return schema
+    
+    @staticmethod
+    def _words(text: str) -> set:
+        return set(WORD_PATTERN.findall(text.lower())) - STOPWORDS
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare les appels Ollama de LLMClient (session keep-alive réutilisée) à l'ancien
+requests.post par appel, contre un faux serveur Ollama local (127.0.0.1, port libre).
+
+Sur localhost le gain vient seulement de la poignée de main TCP évitée; il est plus
+important vers un serveur distant et en TLS (Groq).
+
+Usage: python benchmarks/bench_llm_pool.py [nombre_d_appels]
+"""
+import os
+import sys
+import json
+import time
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+RESPONSE = json.dumps({"message": {"role": "assistant", "content": "réponse"}}).encode("utf-8")
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme Ollama
+    # en-têtes et corps partent en deux écritures: sans ceci, l'ACK retardé ajoute ~40 ms par appel
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        self._reply(b"Ollama is running")
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(RESPONSE)
+    
+    def _reply(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    
+    os.environ.update(LLM_BACKEND="ollama", OLLAMA_BASE_URL=base_url, LLM_CACHE="false")
+    from app.llm_client import LLMClient
+    client = LLMClient()
+    messages = [{"role": "user", "content": "Résume l'article 2401.00001"}]
+    payload = client._ollama_payload(messages)
+    
+    def fresh():
+        # Implémentation d'origine: nouvelle connexion à chaque appel
+        response = requests.post(f"{base_url}/api/chat", json=payload, timeout=30)
+        response.raise_for_status()
+        return response.json()
+    
+    def pooled():
+        return client.create_completion(messages)
+    
+    print(f"{number} completions séquentielles contre {base_url}")
+    for name, fn in (("connexion par appel", fresh), ("session partagée", pooled)):
+        fn()  # échauffement
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<22}{elapsed:>8.3f} s  ({elapsed / number * 1000:.2f} ms/appel)")
+    
+    client.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
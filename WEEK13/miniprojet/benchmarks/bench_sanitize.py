@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare l'ancienne fonction récursive sanitize_log_data au moteur Redactor
+sur des sorties d'outils réalistes (texte de PDF, listing de fichiers).
+
+Usage: python benchmarks/bench_sanitize.py
+"""
+import os
+import sys
+import json
+import timeit
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.redaction import Redactor
+
+def legacy_sanitize_log_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Implémentation d'origine de log_utils.sanitize_log_data (référence)"""
+    if not isinstance(data, dict):
+        return data
+    
+    sanitized = data.copy()
+    
+    sensitive_fields = ['api_key', 'password', 'secret', 'token', 'key', 'credentials']
+    
+    for field in sensitive_fields:
+        if field in sanitized:
+            sanitized[field] = '***REDACTED***'
+    
+    for key, value in sanitized.items():
+        if isinstance(value, dict):
+            sanitized[key] = legacy_sanitize_log_data(value)
+        elif isinstance(value, list):
+            sanitized[key] = [legacy_sanitize_log_data(item) if isinstance(item, dict) else item for item in value]
+    
+    return sanitized
+
+def build_payloads() -> Dict[str, Any]:
+    # Sorties telles que produites par MCPOrchestrator._format_tool_result
+    pdf_text = {"text": "Attention is all you need. " * 20000}  # ~540 Ko
+    text_listing = {"text": "\n".join(f"[FILE] workspace/paper_{i}.pdf" for i in range(5000))}
+    # Sortie structurée volumineuse
+    json_listing = {
+        "entries": [
+            {"name": f"paper_{i}.pdf", "size": i * 1024, "meta": {"tags": ["nlp", "transformers"], "owner": {"id": i}}}
+            for i in range(5000)
+        ]
+    }
+    small_call = {"api_key": "gsk_" + "a" * 40, "arguments": {"query": "transformers", "options": {"token": "abc"}}}
+    return {"pdf_text": pdf_text, "text_listing": text_listing, "json_listing": json_listing, "small_call": small_call}
+
+def main():
+    redactor = Redactor()
+    number = 20
+    
+    def per_call_ms(fn) -> float:
+        return timeit.timeit(fn, number=number) / number * 1000
+    
+    # "journalisé" = nettoyage + sérialisation JSON, ce que coûte réellement un appel journalisé
+    print(f"{'cas':<14}{'ancien':>12}{'nouveau':>12}{'ancien journalisé':>20}{'nouveau journalisé':>20}   (ms)")
+    for name, payload in build_payloads().items():
+        legacy = per_call_ms(lambda: legacy_sanitize_log_data(payload))
+        new = per_call_ms(lambda: redactor.redact(payload))
+        legacy_logged = per_call_ms(lambda: json.dumps(legacy_sanitize_log_data(payload), default=str))
+        new_logged = per_call_ms(lambda: json.dumps(redactor.redact(payload), default=str))
+        print(f"{name:<14}{legacy:>12.3f}{new:>12.3f}{legacy_logged:>20.3f}{new_logged:>20.3f}")
+
+if __name__ == "__main__":
+    main()
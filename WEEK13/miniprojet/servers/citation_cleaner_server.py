@@ -3,14 +3,18 @@
 Serveur MCP personnalisé pour le nettoyage et le formatage des citations académiques.
 """
 import json
-import re
 from typing import Dict, List, Any
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 
+from servers.citation_engine import CitationEngine, iter_citations
+
 # Initialisation du serveur
 server = Server("citation_cleaner")
 
+# Moteur partagé: expressions compilées et pool de processus réutilisés entre les appels
+engine = CitationEngine()
+
 @server.list_tools()
 async def handle_list_tools() -> List[Dict[str, Any]]:
     """Liste les outils disponibles"""
@@ -38,7 +42,7 @@ async def handle_list_tools() -> List[Dict[str, Any]]:
         },
         {
             "name": "extract_citations_from_text",
-            "description": "Extrait les citations d'un texte académique",
+            "description": "Extrait les citations d'un texte académique, avec leur type et leur position",
             "inputSchema": {
                 "type": "object",
                 "properties": {
@@ -67,27 +71,8 @@ async def clean_citations(arguments: Dict) -> List[Dict[str, Any]]:
     citations = arguments.get("citations", [])
     format_style = arguments.get("format", "apa")
     
-    cleaned_citations = []
-    
-    for citation in citations:
-        try:
-            # Nettoyage de base
-            cleaned = citation.strip()
-            cleaned = re.sub(r'\s+', ' ', cleaned)  # Normalise les espaces
-            
-            # Application du style de formatage
-            if format_style == "apa":
-                cleaned = format_apa(cleaned)
-            elif format_style == "mla":
-                cleaned = format_mla(cleaned)
-            elif format_style == "chicago":
-                cleaned = format_chicago(cleaned)
-            # "plain" ne fait rien de plus
-            
-            cleaned_citations.append(cleaned)
-            
-        except Exception as e:
-            cleaned_citations.append(f"ERREUR: {citation} ({str(e)})")
+    # Toute la liste en un passage, les doublons n'étant formatés qu'une fois
+    cleaned_citations = await engine.aclean(citations, format_style)
     
     return [{
         "type": "text",
@@ -102,55 +87,27 @@ async def extract_citations_from_text(arguments: Dict) -> List[Dict[str, Any]]:
     """Extrait les citations d'un texte"""
     text = arguments.get("text", "")
     
-    # Pattern simple pour détecter les citations (à améliorer)
-    citation_patterns = [
-        r'\([A-Za-z]+, \d{4}\)',  # (Auteur, année)
-        r'[A-Za-z]+ et al\. \(\d{4}\)',  # Auteur et al. (année)
-        r'\b\d{4}[a-z]?\b',  # Année seule
-    ]
-    
-    found_citations = []
-    for pattern in citation_patterns:
-        matches = re.findall(pattern, text)
-        found_citations.extend(matches)
+    # Un seul parcours du texte pour tous les types de citation, avec leurs positions
+    occurrences = list(iter_citations(text))
+    # Déduplication dans l'ordre d'apparition
+    unique_citations = list(dict.fromkeys(occurrence["text"] for occurrence in occurrences))
     
     return [{
         "type": "text",
         "content": json.dumps({
-            "extracted_citations": list(set(found_citations)),  # Déduplication
-            "total_found": len(set(found_citations))
+            "extracted_citations": unique_citations,
+            "total_found": len(unique_citations),
+            "occurrences": occurrences
         }, ensure_ascii=False, indent=2)
     }]
 
-def format_apa(citation: str) -> str:
-    """Formate une citation en style APA"""
-    # Implémentation simplifiée
-    if re.search(r'\(\d{4}\)', citation):
-        return citation  # Supposé déjà formaté
-    
-    # Tentative de formatage basique
-    authors = re.findall(r'[A-Z][a-z]+, [A-Z]\.', citation)
-    year = re.findall(r'\b\d{4}\b', citation)
-    
-    if authors and year:
-        return f"{authors[0]} et al. ({year[0]}) {citation}"
-    
-    return citation
-
-def format_mla(citation: str) -> str:
-    """Formate une citation en style MLA"""
-    # Implémentation simplifiée
-    return citation  # Placeholder
-
-def format_chicago(citation: str) -> str:
-    """Formate une citation en style Chicago"""
-    # Implémentation simplifiée
-    return citation  # Placeholder
-
 async def main():
     """Point d'entrée principal"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream)
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream)
+    finally:
+        engine.close()
 
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,180 @@
+"""
+Moteur de nettoyage des citations par lots, utilisé par le serveur citation_cleaner.
+"""
+import os
+import re
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from servers.citation_parser import CitationParser, render_apa, render_mla, render_chicago
+
+# Tous les types de citation en une seule expression: le texte n'est parcouru qu'une fois.
+# La première alternative, sans nom, saute d'un bloc les mots qui ne peuvent pas commencer une
+# citation, pour que le moteur ne réessaie pas chaque position à l'intérieur des mots.
+# Les alternatives ne peuvent pas réussir à la même position: leur ordre ne change pas le résultat.
+MAX_AUTHOR_LENGTH = 64
+CITATION_PATTERN = re.compile(
+    r'(?:[A-Za-z]+(?![A-Za-z])(?! et al\. \()[^(\dA-Za-z]*)+'               # Mots ordinaires
+    rf'|(?P<et_al>[A-Za-z]{{1,{MAX_AUTHOR_LENGTH}}} et al\. \(\d{{4}}\))'  # Auteur et al. (année)
+    r'|(?P<year>\b\d{4}[a-z]?\b)'                                          # Année seule
+    rf'|(?P<author_year>\([A-Za-z]{{1,{MAX_AUTHOR_LENGTH}}}, \d{{4}}\))'   # (Auteur, année)
+)
+# Longueur maximale d'une citation, plus un caractère lu par \b
+CITATION_LOOKAHEAD = MAX_AUTHOR_LENGTH + len(" et al. (2024)") + 1
+
+# Notices analysées partagées par les trois styles (un LRU par processus)
+PARSER = CitationParser()
+
+def format_apa(citation: str) -> str:
+    """Formate une citation en style APA"""
+    return render_apa(PARSER.parse(citation))
+
+def format_mla(citation: str) -> str:
+    """Formate une citation en style MLA"""
+    return render_mla(PARSER.parse(citation))
+
+def format_chicago(citation: str) -> str:
+    """Formate une citation en style Chicago (auteur-date)"""
+    return render_chicago(PARSER.parse(citation))
+
+FORMATTERS: Dict[str, Optional[Callable[[str], str]]] = {
+    "apa": format_apa,
+    "mla": format_mla,
+    "chicago": format_chicago,
+    "plain": None  # "plain" ne fait rien de plus
+}
+
+def clean_chunk(citations: List[Any], format_style: str) -> List[str]:
+    """Nettoie une liste de citations distinctes (fonction de niveau module pour le pool de processus)"""
+    formatter = FORMATTERS.get(format_style)
+    cleaned_citations = []
+    append = cleaned_citations.append
+    
+    for citation in citations:
+        try:
+            # Nettoyage de base: supprime les bords et normalise les espaces
+            cleaned = " ".join(citation.split())
+            append(formatter(cleaned) if formatter else cleaned)
+        except Exception as e:
+            append(f"ERREUR: {citation} ({str(e)})")
+    
+    return cleaned_citations
+
+def iter_citations(text: Union[str, Iterable[str]], chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Parcourt le texte (ou un flux de morceaux) en une passe et produit chaque citation
+    avec son type et ses positions (start, end) dans le texte complet.
+    
+    Le résultat est identique quel que soit le découpage: une position n'est examinée que
+    lorsque les CITATION_LOOKAHEAD caractères suivants sont disponibles.
+    """
+    chunk_size = chunk_size or int(os.getenv("CITATION_CHUNK_CHARS", 1024 * 1024))
+    chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size)) if isinstance(text, str) else text
+    
+    buffer = ""
+    base = 0      # position du buffer dans le texte complet
+    resume = 0    # les positions antérieures du buffer sont déjà traitées
+    finditer = CITATION_PATTERN.finditer
+    
+    for chunk in chunks:
+        buffer += chunk
+        limit = len(buffer) - CITATION_LOOKAHEAD
+        if limit < resume:
+            continue
+        
+        for match in finditer(buffer, resume):
+            if match.lastgroup is None:
+                if match.end() <= limit:
+                    resume = match.end()
+                    continue
+                # Mots sautés jusqu'au-delà de la limite: on reprend après le dernier mot complet
+                # avant la limite (reprendre entre deux mots ne change pas le résultat)
+                end = min(match.end(), limit + 1)
+                while end > resume and buffer[end - 1].isascii() and buffer[end - 1].isalpha():
+                    end -= 1
+                resume = max(resume, end)
+                break
+            if match.start() > limit:
+                resume = max(resume, limit + 1)
+                break
+            yield {"text": match.group(), "type": match.lastgroup, "start": base + match.start(), "end": base + match.end()}
+            resume = match.end()
+        else:
+            resume = max(resume, limit + 1)
+        
+        # On garde un caractère de contexte pour les \b en début de buffer
+        keep = resume - 1
+        if keep > 0:
+            buffer = buffer[keep:]
+            base += keep
+            resume -= keep
+    
+    for match in finditer(buffer, resume):
+        if match.lastgroup is not None:
+            yield {"text": match.group(), "type": match.lastgroup, "start": base + match.start(), "end": base + match.end()}
+
+class CitationEngine:
+    """Nettoie une bibliographie entière en un passage.
+    
+    Les citations identiques ne sont formatées qu'une fois; au-delà de pool_threshold
+    citations distinctes, le travail est réparti par blocs sur un pool de processus.
+    """
+    
+    def __init__(self, pool_threshold: Optional[int] = None, max_workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None):
+        # 0 désactive le pool de processus
+        self.pool_threshold = pool_threshold if pool_threshold is not None else int(os.getenv("CITATION_POOL_THRESHOLD", 20000))
+        self.max_workers = max_workers or int(os.getenv("CITATION_POOL_WORKERS", os.cpu_count() or 1))
+        self.chunk_size = chunk_size or int(os.getenv("CITATION_CHUNK_SIZE", 1000))
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    @staticmethod
+    def _unique(citations: List[Any]) -> tuple:
+        """Renvoie (citations distinctes, position de chaque entrée dans cette liste)"""
+        positions: Dict[Any, int] = {}
+        unique: List[Any] = []
+        mapping: List[int] = []
+        for citation in citations:
+            try:
+                index = positions.setdefault(citation, len(unique))
+            except TypeError:
+                # Entrée non hachable (dict, liste...): conservée telle quelle, elle produira une erreur
+                index = len(unique)
+            if index == len(unique):
+                unique.append(citation)
+            mapping.append(index)
+        return unique, mapping
+    
+    def clean(self, citations: List[Any], format_style: str = "apa") -> List[str]:
+        """Nettoyage synchrone, dans le processus courant"""
+        unique, mapping = self._unique(citations)
+        cleaned = clean_chunk(unique, format_style)
+        return [cleaned[index] for index in mapping]
+    
+    async def aclean(self, citations: List[Any], format_style: str = "apa") -> List[str]:
+        """Nettoyage sans bloquer la boucle; réparti sur le pool pour les grandes listes"""
+        unique, mapping = self._unique(citations)
+        
+        if self.pool_threshold and len(unique) >= self.pool_threshold and self.max_workers > 1:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            chunks = [unique[i:i + self.chunk_size] for i in range(0, len(unique), self.chunk_size)]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, clean_chunk, chunk, format_style) for chunk in chunks
+            ))
+            cleaned = [item for chunk in results for item in chunk]
+        else:
+            cleaned = clean_chunk(unique, format_style)
+        
+        return [cleaned[index] for index in mapping]
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Pool créé à la première grande liste puis réutilisé
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+    
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
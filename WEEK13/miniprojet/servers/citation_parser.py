@@ -0,0 +1,262 @@
+"""
+Analyse des citations brutes en notices structurées et rendu APA / MLA / Chicago.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+YEAR_IN_PARENS_PATTERN = re.compile(r'\(\s*((?:19|20)\d{2}[a-z]?|n\.\s?d\.)\s*\)\.?')
+# Ni dans un identifiant arXiv ("arXiv:2005.14165") ni dans un DOI ("10.1145/2019.123")
+YEAR_PATTERN = re.compile(r'\b(?<![./])((?:19|20)\d{2})[a-z]?\b(?!\.\d)')
+QUOTED_TITLE_PATTERN = re.compile(r'["“]([^"”]+)["”]')
+# Fin de phrase candidate; _split_sentences écarte celles qui suivent une initiale
+SENTENCE_PATTERN = re.compile(r'\.\s+')
+INITIAL_TOKEN_PATTERN = re.compile(r'^(?:[A-Z]\.?-?){1,3}[.,]?$')
+AUTHOR_SEPARATOR_PATTERN = re.compile(r',\s*(?:and|&)\s+|\s+(?:and|&)\s+|\s*&\s*|[,;]')
+ET_AL_PATTERN = re.compile(r',?\s*\bet al\.?', re.IGNORECASE)
+INITIALS_PATTERN = re.compile(r'^(?:[A-Z]\.?\s?-?){1,3}$')
+INITIAL_PATTERN = re.compile(r'(-?)\s*([^\W\d_])[^\s.\-]*\.?')
+NO_DATE_PATTERN = re.compile(r'\bn\.\s?d\b\.?')
+# Particules faisant partie du nom de famille ("van der Maaten", "de Gaulle")
+PARTICLES = frozenset(("van", "von", "der", "den", "de", "del", "della", "di", "da", "du", "le", "la", "ter", "ten"))
+
+def _split_sentences(text: str, maxsplit: int) -> List[str]:
+    """Découpe en phrases. Un point après une initiale ne termine la phrase que si le segment
+    suivant n'est pas lui-même une initiale et que l'initiale suit un nom ("Toutanova K. BERT"),
+    pas un début de liste ou une autre initiale ("J. Smith", "A. B. Smith")."""
+    parts: List[str] = []
+    start = 0
+    for match in SENTENCE_PATTERN.finditer(text):
+        if len(parts) == maxsplit:
+            break
+        before = text[start:match.start()].rsplit(None, 1)
+        if before and INITIAL_TOKEN_PATTERN.match(before[-1]):
+            following = text[match.end():].split(None, 1)
+            if following and INITIAL_TOKEN_PATTERN.match(following[0]):
+                continue
+            preceding = before[0].rstrip() if len(before) > 1 else ""
+            if not preceding[-1:].isalpha():
+                continue
+        parts.append(text[start:match.start()])
+        start = match.end()
+    parts.append(text[start:])
+    return parts
+
+def normalize(citation: str) -> str:
+    """Texte normalisé servant de clé de cache"""
+    return " ".join(citation.split())
+
+def _initials(given: str) -> str:
+    """'Ashish' -> 'A.', 'Jean-Paul' -> 'J.-P.', 'M.W.' -> 'M. W.'"""
+    initials = ""
+    for hyphen, letter in INITIAL_PATTERN.findall(given):
+        separator = "-" if hyphen else " "
+        initials += f"{separator if initials else ''}{letter}."
+    return initials
+
+def _is_family(token: str) -> bool:
+    """Un seul mot, éventuellement précédé de particules ("Maaten", "van der Maaten")"""
+    words = token.split()
+    return bool(words) and all(word.lower() in PARTICLES for word in words[:-1])
+
+def _parse_name(token: str) -> Dict[str, str]:
+    words = token.split()
+    if _is_family(token):
+        return {"family": token, "given": ""}
+    # "Vaswani A" / "van der Maaten LJP": nom suivi des initiales
+    if INITIALS_PATTERN.match(words[-1]) and not INITIALS_PATTERN.match(words[0]):
+        return {"family": " ".join(words[:-1]), "given": " ".join(f"{c}." for c in words[-1] if c.isalpha())}
+    # "A. Vaswani" / "Ludwig van Beethoven": prénom(s) puis nom, particules comprises
+    split = len(words) - 1
+    while split > 1 and words[split - 1].lower() in PARTICLES:
+        split -= 1
+    return {"family": " ".join(words[split:]), "given": " ".join(words[:split])}
+
+def parse_authors(text: str) -> Dict[str, Any]:
+    """Liste d'auteurs {"family", "given"} et indicateur "et al." """
+    et_al = ET_AL_PATTERN.search(text) is not None
+    text = ET_AL_PATTERN.sub("", text).strip(" .,")
+    tokens = [token.strip(" .") for token in AUTHOR_SEPARATOR_PATTERN.split(text)]
+    tokens = [token for token in tokens if token]
+    
+    authors = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        # "Nom, I." (APA) ou "Nom, Prénom" (premier auteur MLA / Chicago)
+        if _is_family(token) and following is not None and (
+            INITIALS_PATTERN.match(following) or (" " not in following and following[:1].isupper())
+        ):
+            given = _initials(following) if INITIALS_PATTERN.match(following) else following
+            authors.append({"family": token, "given": given})
+            i += 2
+        else:
+            authors.append(_parse_name(token))
+            i += 1
+    
+    return {"authors": authors, "et_al": et_al}
+
+def parse_citation(text: str) -> Dict[str, Any]:
+    """Découpe une citation brute en auteurs, année, titre et revue"""
+    record: Dict[str, Any] = {"authors": [], "et_al": False, "year": None, "title": "", "venue": "", "raw": text}
+    
+    year_match = YEAR_IN_PARENS_PATTERN.search(text)
+    quoted = QUOTED_TITLE_PATTERN.search(text)
+    
+    if year_match:
+        # APA: Auteurs (année). Titre. Revue.
+        authors_text, rest = text[:year_match.start()], text[year_match.end():]
+        record["year"] = year_match.group(1) if year_match.group(1)[0].isdigit() else None
+        sentences = _split_sentences(rest.strip(), maxsplit=1)
+        record["title"] = sentences[0]
+        record["venue"] = sentences[1] if len(sentences) > 1 else ""
+    elif quoted:
+        # MLA / Chicago: Auteurs. "Titre." Revue, année.
+        authors_text, record["title"], record["venue"] = text[:quoted.start()], quoted.group(1), text[quoted.end():]
+    else:
+        # Texte libre: Auteurs. Titre. Revue année.
+        sentences = _split_sentences(text, maxsplit=2)
+        if len(sentences) < 2:
+            return record
+        year = YEAR_PATTERN.fullmatch(sentences[1].strip())
+        if year and len(sentences) > 2:
+            # Chicago auteur-date sans parenthèses: Auteurs. Année. Titre. Revue.
+            record["year"] = year.group(1)
+            sentences = sentences[:1] + _split_sentences(sentences[2], maxsplit=1)
+        authors_text, record["title"] = sentences[0], sentences[1]
+        record["venue"] = sentences[2] if len(sentences) > 2 else ""
+    
+    # Chicago auteur-date: l'année suit directement les auteurs
+    authors_text = NO_DATE_PATTERN.sub("", authors_text)
+    year = YEAR_PATTERN.search(authors_text)
+    if year:
+        authors_text = authors_text[:year.start()]
+        record["year"] = record["year"] or year.group(1)
+    
+    if record["year"] is None:
+        year = YEAR_PATTERN.search(record["venue"])
+        if year:
+            record["year"] = year.group(1)
+            record["venue"] = record["venue"][:year.start()] + record["venue"][year.end():]
+    
+    record.update(parse_authors(authors_text))
+    record["title"] = record["title"].strip(" .,")
+    record["venue"] = re.sub(r'\(\s*\)', '', record["venue"]).strip(" .,;")
+    return record
+
+class CitationParser:
+    """Analyse mémoïsée: LRU borné indexé par le texte normalisé de la citation"""
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("CITATION_CACHE_SIZE", 20000))
+        self.hits = 0
+        self.misses = 0
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def parse(self, citation: str) -> Dict[str, Any]:
+        """Notice structurée de la citation (à ne pas modifier: elle est partagée par le cache)"""
+        key = normalize(citation)
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+                self.hits += 1
+                return record
+        
+        record = parse_citation(key)
+        with self._lock:
+            self.misses += 1
+            self._records[key] = record
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        return record
+    
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._records)}
+    
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+def _is_parsed(record: Dict[str, Any]) -> bool:
+    """Sans année, titre ou noms plausibles, la citation est rendue telle quelle plutôt que déformée"""
+    if not (record["authors"] and record["title"] and record["year"]):
+        return False
+    for author in record["authors"]:
+        family = [word for word in author["family"].split() if word.lower() not in PARTICLES]
+        if not family or not family[0][:1].isupper():
+            return False
+    return True
+
+def _sentence(text: str) -> str:
+    """Ajoute un point final sauf si la phrase a déjà une ponctuation finale"""
+    return text if text[-1:] in ".?!" else f"{text}."
+
+def _inverted(author: Dict[str, str], initials: bool = False) -> str:
+    """'Nom, Prénom' ou 'Nom, I.'"""
+    given = _initials(author["given"]) if initials else author["given"]
+    return f"{author['family']}, {given}" if given else author["family"]
+
+def _natural(author: Dict[str, str]) -> str:
+    """'Prénom Nom'"""
+    return f"{author['given']} {author['family']}" if author["given"] else author["family"]
+
+def render_apa(record: Dict[str, Any]) -> str:
+    """Auteur, A., & Auteur, B. (année). Titre. Revue."""
+    if not _is_parsed(record):
+        return record["raw"]
+    names = [_inverted(author, initials=True) for author in record["authors"][:20]]
+    if record["et_al"] or len(record["authors"]) > 20:
+        authors = ", ".join(names) + ", et al."
+    elif len(names) == 1:
+        authors = names[0]
+    else:
+        authors = ", ".join(names[:-1]) + ", & " + names[-1]
+    parts = [_sentence(authors), f"({record['year'] or 'n.d.'}).", _sentence(record["title"])]
+    if record["venue"]:
+        parts.append(_sentence(record["venue"]))
+    return " ".join(parts)
+
+def render_mla(record: Dict[str, Any]) -> str:
+    """Nom, Prénom, et al. "Titre." Revue, année."""
+    if not _is_parsed(record):
+        return record["raw"]
+    authors = record["authors"]
+    if len(authors) >= 3 or record["et_al"]:
+        names = f"{_inverted(authors[0])}, et al"
+    elif len(authors) == 2:
+        names = f"{_inverted(authors[0])}, and {_natural(authors[1])}"
+    else:
+        names = _inverted(authors[0])
+    container = ", ".join(part for part in (record["venue"], record["year"]) if part)
+    parts = [_sentence(names), f"\"{_sentence(record['title'])}\""]
+    if container:
+        parts.append(_sentence(container))
+    return " ".join(parts)
+
+def render_chicago(record: Dict[str, Any]) -> str:
+    """Chicago auteur-date: Nom, Prénom, et Prénom Nom. Année. "Titre." Revue."""
+    if not _is_parsed(record):
+        return record["raw"]
+    authors = record["authors"]
+    if len(authors) > 10:
+        names = [_inverted(authors[0])] + [_natural(a) for a in authors[1:7]]
+        text = ", ".join(names) + ", et al"
+    else:
+        names = [_inverted(authors[0])] + [_natural(a) for a in authors[1:]]
+        if len(names) == 1:
+            text = names[0]
+        elif len(names) == 2:
+            text = f"{names[0]}, and {names[1]}"
+        else:
+            text = ", ".join(names[:-1]) + ", and " + names[-1]
+        if record["et_al"]:
+            text += ", et al"
+    parts = [_sentence(text), f"{record['year'] or 'n.d'}.", f"\"{_sentence(record['title'])}\""]
+    if record["venue"]:
+        parts.append(_sentence(record["venue"]))
+    return " ".join(parts)
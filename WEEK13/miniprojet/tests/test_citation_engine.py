@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from servers.citation_engine import CITATION_PATTERN, CitationEngine, iter_citations
+
+PIECES = ["Smith", "et", "al.", "Smith et al. (2020)", "(Doe, 2019)", "(Doe,2019)", "2021a", "19999", "in",
+          "Nguyen et al. (1998)", "(", ")", ",", ".", "—", "été", "x" * 70 + " et al. (2001)", "\n", "  ", "ab12", "1234"]
+
+def whole_text(text):
+    return [{"text": m.group(), "type": m.lastgroup, "start": m.start(), "end": m.end()}
+            for m in CITATION_PATTERN.finditer(text) if m.lastgroup is not None]
+
+def random_text(rng):
+    return "".join(rng.choice(PIECES) + rng.choice(["", " ", " ", ", "]) for _ in range(rng.randint(0, 300)))
+
+def random_split(rng, text):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 30))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+def test_types_and_offsets():
+    text = "Voir Smith et al. (2020) puis (Doe, 2019) et 2021a."
+    found = list(iter_citations(text))
+    assert [(c["type"], c["text"]) for c in found] == [
+        ("et_al", "Smith et al. (2020)"), ("author_year", "(Doe, 2019)"), ("year", "2021a")
+    ]
+    assert all(text[c["start"]:c["end"]] == c["text"] for c in found)
+
+@pytest.mark.parametrize("seed", range(40))
+def test_chunking_matches_a_whole_text_scan(seed):
+    rng = random.Random(seed)
+    text = random_text(rng)
+    expected = whole_text(text)
+    for chunk_size in (1, 2, 7, 64, 83, 1000):
+        assert list(iter_citations(text, chunk_size=chunk_size)) == expected
+    assert list(iter_citations(random_split(rng, text))) == expected
+
+def test_clean_formats_each_distinct_citation_once():
+    engine = CitationEngine(pool_threshold=0)
+    citations = ["  Smith,  J.  (2020). Title.  ", "  Smith,  J.  (2020). Title.  ", {"pas": "une chaîne"}]
+    cleaned = engine.clean(citations, "plain")
+    assert cleaned[0] == cleaned[1] == "Smith, J. (2020). Title."
+    assert cleaned[2].startswith("ERREUR")
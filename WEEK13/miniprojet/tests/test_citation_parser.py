@@ -0,0 +1,71 @@
+import pytest
+
+from servers.citation_parser import parse_citation, render_apa, render_mla, render_chicago
+
+VANCOUVER = ("Devlin J, Chang MW, Lee K, Toutanova K. BERT: Pre-training of deep bidirectional "
+             "transformers for language understanding. NAACL 2019.")
+ET_AL = "Goodfellow I, et al. Generative adversarial nets. NIPS 2014."
+PARTICLE = ("van der Maaten, L., & Hinton, G. (2008). Visualizing data using t-SNE. "
+            "Journal of Machine Learning Research, 9, 2579-2605.")
+ARXIV = "Brown, T. B. et al. 2020. Language models are few-shot learners. arXiv preprint arXiv:2005.14165."
+APA = ("Vaswani, A., Shazeer, N., & Parmar, N. (2017). Attention is all you need. "
+       "Advances in Neural Information Processing Systems.")
+
+def test_vancouver_authors_end_after_last_initial():
+    record = parse_citation(VANCOUVER)
+    assert [a["family"] for a in record["authors"]] == ["Devlin", "Chang", "Lee", "Toutanova"]
+    assert record["authors"][1]["given"] == "M. W."
+    assert record["title"].startswith("BERT: Pre-training")
+    assert record["year"] == "2019"
+    assert render_apa(record).startswith("Devlin, J., Chang, M. W., Lee, K., & Toutanova, K. (2019). BERT:")
+
+def test_vancouver_et_al():
+    record = parse_citation(ET_AL)
+    assert record["authors"] == [{"family": "Goodfellow", "given": "I."}]
+    assert record["et_al"] is True
+    assert record["title"] == "Generative adversarial nets"
+    assert render_apa(record) == "Goodfellow, I., et al. (2014). Generative adversarial nets. NIPS."
+
+def test_family_name_particles():
+    record = parse_citation(PARTICLE)
+    assert record["authors"] == [{"family": "van der Maaten", "given": "L."}, {"family": "Hinton", "given": "G."}]
+    assert render_apa(record) == PARTICLE
+    assert parse_citation("van der Maaten LJP, Hinton GE. Visualizing data using t-SNE. J Mach Learn Res 2008.")["authors"][0] == \
+        {"family": "van der Maaten", "given": "L. J. P."}
+
+def test_author_date_year_and_arxiv_id():
+    record = parse_citation(ARXIV)
+    assert record["year"] == "2020"
+    assert record["title"] == "Language models are few-shot learners"
+    assert record["venue"] == "arXiv preprint arXiv:2005.14165"
+    assert render_apa(record) == ("Brown, T. B., et al. (2020). Language models are few-shot learners. "
+                                  "arXiv preprint arXiv:2005.14165.")
+    assert render_mla(record) == ("Brown, T. B., et al. \"Language models are few-shot learners.\" "
+                                  "arXiv preprint arXiv:2005.14165, 2020.")
+    assert render_chicago(record) == ("Brown, T. B., et al. 2020. \"Language models are few-shot learners.\" "
+                                      "arXiv preprint arXiv:2005.14165.")
+
+def test_year_in_venue_is_removed_without_touching_identifiers():
+    record = parse_citation("Smith J. Deep nets. arXiv:2005.14165, 2021.")
+    assert record["year"] == "2021"
+    assert record["venue"] == "arXiv:2005.14165"
+
+def test_leading_initials_do_not_end_the_author_list():
+    record = parse_citation("J. Smith, K. Lee. A study of things. Nature 2020.")
+    assert [a["family"] for a in record["authors"]] == ["Smith", "Lee"]
+    assert record["title"] == "A study of things"
+
+@pytest.mark.parametrize("text", [
+    "random words without structure",
+    "Smith J. A study without a year. Some journal.",
+])
+def test_unparsed_citations_are_returned_unchanged(text):
+    record = parse_citation(text)
+    for render in (render_apa, render_mla, render_chicago):
+        assert render(record) == text
+
+@pytest.mark.parametrize("render", [render_apa, render_mla, render_chicago])
+@pytest.mark.parametrize("text", [VANCOUVER, ET_AL, PARTICLE, APA])
+def test_rendering_round_trips(render, text):
+    rendered = render(parse_citation(text))
+    assert render(parse_citation(rendered)) == rendered
@@ -0,0 +1,36 @@
+from app.context_window import ContextWindow
+
+def make_window(**kwargs):
+    window = ContextWindow(**kwargs)
+    for i in range(6):
+        window.add("arxiv.read_paper", {"id": f"2401.0000{i}"}, {"id": i, "text": f"contenu {i} " * 400})
+    return window
+
+def test_recent_results_stay_whole_within_budget():
+    window = make_window(token_budget=100000, keep_recent=2, summary_chars=50)
+    messages = window.messages()
+    assert len(messages) == 12
+    assert "tronqué" in messages[1]["content"]          # ancien: résumé
+    assert "tronqué" not in messages[-1]["content"]     # récent: intact
+    assert window.token_count() <= 100000
+
+def test_oldest_results_are_dropped_first_when_over_budget():
+    window = make_window(token_budget=2400, keep_recent=2, summary_chars=300)
+    results = [m["content"] for m in window.messages()[1::2]]
+    assert results[0].startswith("Résultat de arxiv.read_paper omis")
+    assert all(r.endswith("[tronqué, 4021 caractères]") for r in results[1:4])
+    assert "tronqué" not in results[-1]
+    assert window.token_count() <= 2400
+
+def test_recent_results_share_what_is_left_as_a_last_resort():
+    window = make_window(token_budget=800, keep_recent=2, summary_chars=100)
+    results = [m["content"] for m in window.messages()[1::2]]
+    assert all("omis" in r for r in results[:4])
+    assert all("tronqué" in r for r in results[4:])
+    assert window.token_count() <= 800
+
+def test_identical_results_are_not_repeated():
+    window = ContextWindow(token_budget=100000, keep_recent=5)
+    window.add("arxiv.search_papers", {"query": "gnn"}, {"papers": ["a", "b"]})
+    window.add("arxiv.search_papers", {"query": "GNN"}, {"papers": ["a", "b"]})
+    assert window.messages()[3]["content"] == "Résultat identique à celui de l'appel n°1"
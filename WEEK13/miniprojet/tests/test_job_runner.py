@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import Future
+
+from app.job_runner import JobRunner
+
+class FakePool:
+    def __init__(self):
+        self.submitted = 0
+    
+    def submit(self, coroutine):
+        coroutine.close()
+        self.submitted += 1
+        return Future()
+
+class FakeOrchestrator:
+    def __init__(self):
+        self.pool = FakePool()
+
+def test_concurrent_submits_of_one_query_share_a_job(tmp_path):
+    orchestrator = FakeOrchestrator()
+    runner = JobRunner(orchestrator, db_path=str(tmp_path / "jobs.db"))
+    barrier = threading.Barrier(16)
+    ids = []
+    
+    def submit():
+        barrier.wait()
+        ids.append(runner.submit("Transformers  pour la chimie"))
+    
+    threads = [threading.Thread(target=submit) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(set(ids)) == 1
+    assert orchestrator.pool.submitted == 1
+    assert runner.get(ids[0])["status"] == "queued"
+    runner.close()
+
+def test_force_still_reuses_an_active_job(tmp_path):
+    orchestrator = FakeOrchestrator()
+    runner = JobRunner(orchestrator, db_path=str(tmp_path / "jobs.db"))
+    job_id = runner.submit("graph neural networks")
+    assert runner.submit("Graph neural  networks", force=True) == job_id
+    assert runner.submit("autre recherche") != job_id
+    assert orchestrator.pool.submitted == 2
+    runner.close()
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app.orchestrator as orchestrator_module
+from app.orchestrator import MCPOrchestrator
+from app.retry_policy import RetryPolicy
+
+class HangingSession:
+    async def call_tool(self, name, arguments):
+        await asyncio.sleep(3600)
+
+def make_orchestrator():
+    orchestrator = MCPOrchestrator.__new__(MCPOrchestrator)
+    orchestrator.sessions = {"arxiv": HangingSession()}
+    orchestrator.server_tools = {"arxiv": [{"name": "arxiv.search", "inputSchema": {"type": "object"}}]}
+    orchestrator.retry_policy = RetryPolicy(1)
+    orchestrator.breakers = {}
+    orchestrator.server_concurrency = 2
+    orchestrator._server_semaphores = {}
+    return orchestrator
+
+def test_cancelled_tool_call_is_logged_as_failure(monkeypatch):
+    calls = []
+    monkeypatch.setattr(orchestrator_module, "log_tool_call",
+                        lambda tool, inputs, outputs, success, **kwargs: calls.append((tool, outputs, success)))
+    
+    async def run():
+        task = asyncio.create_task(make_orchestrator().execute_tool("arxiv.search", {"query": "x"}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+    
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
+    assert calls == [("arxiv.search", {"error": "cancelled"}, False)]
+
+class FileSession:
+    def __init__(self):
+        self.calls = 0
+    
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        if arguments["path"] == "absent.md":
+            return SimpleNamespace(content=[SimpleNamespace(text="ENOENT: no such file or directory")], isError=True)
+        return SimpleNamespace(content=[SimpleNamespace(text="# Notes")], isError=False)
+
+def test_tool_errors_are_not_retried_nor_counted_by_the_breaker(monkeypatch):
+    monkeypatch.setattr(orchestrator_module, "log_tool_call", lambda *args, **kwargs: None)
+    session = FileSession()
+    orchestrator = make_orchestrator()
+    orchestrator.sessions = {"filesystem": session}
+    orchestrator.server_tools = {"filesystem": [{"name": "filesystem.read_file", "inputSchema": {"required": ["path"]}}]}
+    orchestrator.retry_policy = RetryPolicy(3)
+    
+    async def run():
+        missing = [await orchestrator.execute_tool("filesystem.read_file", {"path": "absent.md"}) for _ in range(2)]
+        return missing, await orchestrator.execute_tool("filesystem.read_file", {"path": "notes.md"})
+    
+    missing, found = asyncio.run(run())
+    assert all(output == {"error": "ENOENT: no such file or directory", "status": "failed"} for output in missing)
+    assert found == {"text": "# Notes"}
+    assert session.calls == 3
+    assert orchestrator.breakers["filesystem"].state == "closed"
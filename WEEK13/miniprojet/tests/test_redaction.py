@@ -0,0 +1,25 @@
+import pytest
+
+from app.redaction import Redactor, REDACTED
+
+@pytest.mark.parametrize("key", ["token", "access_token", "refresh_token", "accessToken", "github_token", "X-Auth-Token", "api_key", "password"])
+def test_sensitive_keys_are_redacted(key):
+    assert Redactor().redact({key: "valeur"}) == {key: REDACTED}
+
+@pytest.mark.parametrize("key", ["max_tokens", "tokens_in", "tokens_out", "spec_tokens", "system_tokens", "tokenizer"])
+def test_token_counters_are_kept(key):
+    assert Redactor().redact({key: 512}) == {key: 512}
+
+def test_secret_values_are_redacted_in_nested_structures():
+    data = {"messages": [{"content": "Authorization: Bearer abc.def"}], "usage": {"tokens_in": 10}}
+    redacted = Redactor().redact(data)
+    assert REDACTED in redacted["messages"][0]["content"]
+    assert redacted["usage"] == {"tokens_in": 10}
+
+def test_secret_cut_by_truncation_is_still_redacted():
+    redactor = Redactor(max_string=100)
+    value = "x" * 90 + "gsk_" + "A" * 40 + " fin"
+    redacted = redactor.redact_string(value)
+    assert "gsk_" not in redacted and "AAAAAA" not in redacted
+    assert redacted.endswith(f"… [{len(value)} caractères]")
+    assert len(redacted.split("…")[0]) == 100
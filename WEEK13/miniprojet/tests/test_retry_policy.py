@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+def test_half_open_admits_a_single_probe():
+    breaker = open_breaker()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_probe_success_closes_and_failure_reopens():
+    breaker = open_breaker()
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+    
+    breaker = open_breaker()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.allow()  # reset_timeout=0: nouvel essai possible
+    assert not breaker.allow()
+
+def test_concurrent_callers_in_half_open_run_one_probe():
+    breaker = open_breaker()
+    policy = RetryPolicy(1)
+    calls = []
+    
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+    
+    async def main():
+        return await asyncio.gather(*(policy.call("arxiv.search", operation, breaker) for _ in range(5)),
+                                    return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results.count("ok") == 1
+    assert all(isinstance(r, CircuitOpenError) for r in results if r != "ok")
+    assert breaker.state == "closed"
+
+def test_cancelled_probe_releases_the_slot():
+    breaker = open_breaker()
+    
+    async def operation():
+        await asyncio.sleep(3600)
+    
+    async def main():
+        task = asyncio.create_task(RetryPolicy(1).call("arxiv.search", operation, breaker))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(main())
+    assert breaker.allow()
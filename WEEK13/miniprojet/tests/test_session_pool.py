@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from app.session_pool import MCPSessionPool
+
+class FakeSession:
+    def __init__(self):
+        self.pings = 0
+    
+    async def send_ping(self):
+        self.pings += 1
+
+class FakeOrchestrator:
+    def __init__(self, broken=()):
+        self.server_configs = {"arxiv": {}, "filesystem": {}}
+        self.sessions = {}
+        self.broken = set(broken)
+        self.initialized = 0
+        self.restarts = []
+        self.closed = False
+    
+    async def initialize_servers(self):
+        self.initialized += 1
+        self.sessions = {name: FakeSession() for name in self.server_configs if name not in self.broken}
+    
+    def is_server_alive(self, name):
+        return name in self.sessions
+    
+    async def restart_server(self, name):
+        self.restarts.append(name)
+        return False
+    
+    async def close_sessions(self):
+        self.closed = True
+
+def test_sessions_are_initialized_once_and_reused():
+    orchestrator = FakeOrchestrator()
+    pool = MCPSessionPool(orchestrator)
+    
+    async def where():
+        return threading.current_thread().name
+    
+    try:
+        assert {pool.run(where(), timeout=5) for _ in range(5)} == {"mcp-session-pool"}
+        assert orchestrator.initialized == 1
+    finally:
+        pool.shutdown()
+    assert orchestrator.closed and not pool.running
+
+def test_health_check_pings_and_backs_off_failed_restarts():
+    orchestrator = FakeOrchestrator(broken={"filesystem"})
+    pool = MCPSessionPool(orchestrator)
+    pool.health_check_interval = 30
+    
+    async def main():
+        await pool.ensure_ready()
+        assert pool._failures == {"filesystem": 1}
+        # Redémarrage pas encore dû: aucun nouvel essai
+        await pool.ensure_ready()
+        assert orchestrator.restarts == []
+        pool._retry_at["filesystem"] = 0
+        await pool.ensure_ready()
+    
+    asyncio.run(main())
+    assert orchestrator.restarts == ["filesystem"]
+    assert orchestrator.sessions["arxiv"].pings == 1
+    assert pool._failures == {"filesystem": 2}
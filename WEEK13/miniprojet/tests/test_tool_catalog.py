@@ -0,0 +1,49 @@
+from app.tool_catalog import ToolCatalog
+
+# Outils réels: serveurs arxiv et filesystem (npx, descriptions en anglais), citation_cleaner (français)
+TOOLS = [
+    {"name": "arxiv.search_papers", "description": "Search arXiv for papers matching a query, newest first"},
+    {"name": "arxiv.download_paper", "description": "Download the PDF of an arXiv paper"},
+    {"name": "arxiv.read_paper", "description": "Read the full text of a downloaded paper"},
+    {"name": "filesystem.read_file", "description": "Read the complete contents of a file"},
+    {"name": "filesystem.read_multiple_files", "description": "Read the contents of multiple files at once"},
+    {"name": "filesystem.write_file", "description": "Create a new file or overwrite an existing file"},
+    {"name": "filesystem.edit_file", "description": "Make line-based edits to a text file"},
+    {"name": "filesystem.create_directory", "description": "Create a new directory"},
+    {"name": "filesystem.list_directory", "description": "List the files and directories in a path"},
+    {"name": "filesystem.move_file", "description": "Move or rename files and directories"},
+    {"name": "filesystem.search_files", "description": "Recursively search for files matching a pattern"},
+    {"name": "filesystem.get_file_info", "description": "Get metadata about a file or directory"},
+    {"name": "citation_cleaner.clean_citations", "description": "Nettoie et formate une liste de citations bibliographiques"},
+    {"name": "citation_cleaner.extract_citations_from_text", "description": "Extrait les citations d'un texte académique, avec leur type et leur position"},
+]
+
+QUERY = ("Trouve les derniers articles sur les transformers en NLP, télécharge les PDFs pertinents, "
+         "et crée un résumé avec les citations formatées correctement.")
+
+def make_catalog(**kwargs):
+    catalog = ToolCatalog(**kwargs)
+    catalog.refresh({}, TOOLS)
+    return catalog
+
+def names(tools):
+    return {tool["name"] for tool in tools}
+
+def test_filter_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("TOOL_CATALOG_MAX_TOOLS", raising=False)
+    assert make_catalog().select(QUERY) == make_catalog().tools
+
+def test_placeholder_query_keeps_every_server():
+    selected = names(make_catalog(max_tools=5).select(QUERY))
+    assert {"arxiv.search_papers", "citation_cleaner.clean_citations"} <= selected
+    assert any(name.startswith("filesystem.") for name in selected)
+
+def test_stopwords_do_not_count():
+    catalog = make_catalog(max_tools=4)
+    # seuls des mots vides en commun: le filtre renonce et envoie tout
+    assert catalog.select("les une pour the and") == catalog.tools
+
+def test_tools_already_called_stay_available():
+    selected = names(make_catalog(max_tools=3).select("search arxiv papers", called={"filesystem.move_file"}))
+    assert "arxiv.search_papers" in selected and "filesystem.move_file" in selected
+    assert len({name.split(".", 1)[0] for name in selected}) == 3
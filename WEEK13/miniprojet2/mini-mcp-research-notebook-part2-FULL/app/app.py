@@ -3,6 +3,8 @@ import streamlit as st
 from app.config import load_mcp_config
 from app.orchestrator import MCPHub, Orchestrator
 from app.log_utils import LogSink
+from app.llm_client import aclose_clients
+from app.batch import run_batch, parse_goals
 
 st.set_page_config(page_title="MCP Research Notebook", layout="wide")
 st.title("MCP Research Notebook")
@@ -15,11 +17,30 @@ run = st.button("Lancer l'agent")
 
 if "last_run" not in st.session_state:
     st.session_state.last_run = None
+if "last_batch" not in st.session_state:
+    st.session_state.last_batch = None
+
+with st.expander("Mode batch (un brief par objectif, serveurs MCP démarrés une seule fois)"):
+    uploaded = st.file_uploader("Fichier d'objectifs (un par ligne)", type=["txt"])
+    goals_text = st.text_area("…ou objectifs, un par ligne", height=120)
+    parallel = st.number_input("Runs simultanés", min_value=1, max_value=16,
+                               value=int(os.environ.get("BATCH_PARALLELISM", 4)))
+    run_many = st.button("Lancer le batch")
+    if run_many:
+        goals = parse_goals(uploaded.getvalue().decode("utf-8") if uploaded else goals_text)
+        if goals:
+            with st.spinner(f"{len(goals)} objectifs en cours…"):
+                st.session_state.last_batch = asyncio.run(run_batch(goals, int(parallel), mode=mode))
+        else:
+            st.warning("Aucun objectif.")
+    if st.session_state.last_batch:
+        st.dataframe([{k: r[k] for k in ("goal", "status", "total_s", "brief", "log", "error")}
+                      for r in st.session_state.last_batch], use_container_width=True)
 
 if run and user_goal:
     cfg = load_mcp_config()
     logs = LogSink()
-    hub = MCPHub(cfg)
+    hub = MCPHub(cfg, logs)
     async def _run():
         await hub.start()
         try:
@@ -29,6 +50,8 @@ if run and user_goal:
             return result, logs.path
         finally:
             await hub.stop()
+            await aclose_clients()
+            logs.close()
     result, logpath = asyncio.run(_run())
     st.session_state.last_run = (result, logpath)
 
@@ -36,6 +59,12 @@ if st.session_state.last_run:
     result, logpath = st.session_state.last_run
     st.subheader("Réponse finale")
     st.markdown(result.get("final") or "(Pas de réponse finale produite)")
+    metrics = result.get("metrics")
+    if metrics:
+        st.subheader("Métriques du run")
+        st.write(f"Durée totale: {metrics['total_s']} s — LLM: {metrics['llm']['total_s']} s "
+                 f"({metrics['llm']['tokens_in']} jetons en entrée, {metrics['llm']['tokens_out']} en sortie)")
+        st.table([{"outil": name, **stats} for name, stats in metrics["tools"].items()])
     st.subheader("Logs JSONL")
     with open(logpath, "r", encoding="utf-8") as f:
         st.code(f.read(), language="json")
@@ -0,0 +1,94 @@
+import os, re, sys, json, time, asyncio, argparse
+from typing import Any, Callable, Dict, List
+from dotenv import load_dotenv
+from app.config import load_mcp_config
+from app.orchestrator import MCPHub, Orchestrator
+from app.log_utils import LogSink
+from app.llm_client import aclose_clients
+
+load_dotenv()
+
+def read_goals(path: str) -> List[str]:
+    """Un objectif par ligne; lignes vides et commentaires (#) ignorés"""
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_goals(f.read())
+
+def parse_goals(text: str) -> List[str]:
+    return [l.strip() for l in text.splitlines() if l.strip() and not l.lstrip().startswith("#")]
+
+def slugify(goal: str, used: set) -> str:
+    base = re.sub(r"[^a-z0-9]+", "-", goal.lower()).strip("-")[:48].strip("-") or "brief"
+    slug, n = base, 2
+    while slug in used:
+        slug, n = f"{base}-{n}", n + 1
+    used.add(slug)
+    return slug
+
+async def run_batch(goals: List[str], parallelism: int = None, out_dir: str = None, mode: str = "Brief standard",
+                    on_done: Callable[[Dict[str, Any]], None] = None) -> List[Dict[str, Any]]:
+    """Exécute les objectifs sur un seul MCPHub démarré une fois; au plus parallelism runs à la fois.
+    Chaque objectif a son brief (out_dir/<slug>.md) et son JSONL; index.json récapitule le batch."""
+    parallelism = parallelism or int(os.environ.get("BATCH_PARALLELISM", 4))
+    out_dir = out_dir or os.environ.get("BATCH_OUT_DIR", "./briefs")
+    os.makedirs(out_dir, exist_ok=True)
+    used: set = set()
+    slugs = [slugify(g, used) for g in goals]
+
+    hub_logs = LogSink(name="hub")
+    hub = MCPHub(load_mcp_config(), hub_logs)
+    gate = asyncio.Semaphore(parallelism)
+
+    async def one(goal: str, slug: str) -> Dict[str, Any]:
+        async with gate:
+            logs = LogSink(name=slug)
+            entry = {"goal": goal, "slug": slug, "status": "running", "brief": None, "log": logs.path,
+                     "error": None, "total_s": None}
+            try:
+                result = await Orchestrator(hub, logs).run_goal(f"{goal}\nMode: {mode}\nOutput: {slug}.md")
+                entry["total_s"] = result["metrics"]["total_s"]
+                if result.get("final"):
+                    entry["brief"] = os.path.join(out_dir, f"{slug}.md")
+                    with open(entry["brief"], "w", encoding="utf-8") as f:
+                        f.write(result["final"])
+                    entry["status"] = "done"
+                else:
+                    entry["status"] = "no_answer"
+            except Exception as e:
+                entry["status"], entry["error"] = "error", str(e) or type(e).__name__
+            finally:
+                logs.close()
+        if on_done:
+            on_done(entry)
+        return entry
+
+    t0 = time.perf_counter()
+    await hub.start()
+    try:
+        results = list(await asyncio.gather(*(one(g, s) for g, s in zip(goals, slugs))))
+    finally:
+        await hub.stop()
+        await aclose_clients()
+        hub_logs.close()
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"total_s": round(time.perf_counter() - t0, 3), "parallelism": parallelism, "hub_log": hub_logs.path,
+                   "goals": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+def main(argv: List[str] = None) -> int:
+    p = argparse.ArgumentParser(description="Briefs de recherche en lot sur un seul hub MCP")
+    p.add_argument("goals", help="fichier d'objectifs, un par ligne")
+    p.add_argument("--parallel", type=int, default=None, help="runs simultanés (BATCH_PARALLELISM, 4)")
+    p.add_argument("--out", default=None, help="dossier des briefs (BATCH_OUT_DIR, ./briefs)")
+    p.add_argument("--mode", default="Brief standard")
+    a = p.parse_args(argv)
+    goals = read_goals(a.goals)
+    if not goals:
+        print("Aucun objectif.", file=sys.stderr)
+        return 1
+    def show(e):
+        print(f"[{e['status']}] {e['slug']} ({e['total_s']} s) {e['brief'] or e['error'] or ''}", flush=True)
+    results = asyncio.run(run_batch(goals, a.parallel, a.out, a.mode, on_done=show))
+    return 0 if all(r["status"] == "done" for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
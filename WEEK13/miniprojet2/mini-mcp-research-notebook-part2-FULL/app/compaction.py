@@ -0,0 +1,131 @@
+import os, re, json
+from collections import deque
+from typing import Any, Dict, List, Tuple
+from app.log_utils import summarize
+
+ARXIV_ID = re.compile(r"\b(?:arXiv:)?(\d{4}\.\d{4,5}(?:v\d+)?)\b")
+DOI = re.compile(r"\b(10\.\d{4,9}/[^\s\"'<>,;{}]+)")
+BIBTEX_KEY = re.compile(r"@\w+\{([^,\s]+),")
+BIBTEX_TITLE = re.compile(r"\btitle\s*=\s*\{([^{}]{1,300})\}", re.IGNORECASE)
+
+# clés JSON retenues dans les résultats d'outils -> catégorie du résumé
+SALIENT_KEYS = {
+    "title": "titles",
+    "id": "ids", "arxiv_id": "ids", "paper_id": "ids", "entry_id": "ids",
+    "doi": "dois",
+    "key": "bibtex_keys", "bibtex_key": "bibtex_keys", "citation_key": "bibtex_keys",
+    "path": "paths", "file": "paths",
+    "error": "errors"
+}
+MAX_PER_FIELD = 10
+FACTS_LABEL, PREVIEW_LABEL = "faits: ", "\naperçu: "
+MAX_NODES = 5000
+
+def result_texts(content: Any) -> str:
+    return "\n".join(getattr(c, "text", None) or "" for c in content) if isinstance(content, list) else ""
+
+def salient(content: Any, scan_chars: int = None, text: str = None) -> Dict[str, List[str]]:
+    """Titres, identifiants arXiv, DOI, clés BibTeX... d'un résultat d'outil, sans le sérialiser
+    (text: result_texts(content) si l'appelant l'a déjà)"""
+    scan_chars = scan_chars or int(os.environ.get("COMPACT_SCAN_CHARS", 200_000))
+    facts: Dict[str, List[str]] = {}
+
+    def add(field: str, value: Any):
+        if isinstance(value, (str, int)) and not isinstance(value, bool):
+            value = " ".join(str(value).split())[:200]
+            values = facts.setdefault(field, [])
+            if value and value not in values and len(values) < MAX_PER_FIELD:
+                values.append(value)
+
+    text = (result_texts(content) if text is None else text)[:scan_chars]
+    data = None
+    if text.lstrip()[:1] in ("{", "["):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            pass  # JSON tronqué ou texte libre: on se contente des motifs
+    if data is None and not text:
+        data = content.model_dump() if hasattr(content, "model_dump") else content
+
+    # parcours borné des dict/listes
+    stack, seen = [data], 0
+    while stack and seen < MAX_NODES:
+        o = stack.pop()
+        seen += 1
+        if isinstance(o, dict):
+            for k, v in o.items():
+                field = SALIENT_KEYS.get(str(k).lower())
+                if field and not isinstance(v, (dict, list)):
+                    add(field, v)
+                elif isinstance(v, (dict, list)):
+                    stack.append(v)
+        elif isinstance(o, list):
+            stack.extend(reversed(o))
+
+    for m in ARXIV_ID.finditer(text):
+        # "2401.00123" dans une URL, après "2401.00123v1" dans le JSON: même article
+        if not any(v.startswith(m.group(1)) for v in facts.get("ids", ())):
+            add("ids", m.group(1))
+    for m in DOI.finditer(text):
+        add("dois", m.group(1).rstrip("."))
+    for m in BIBTEX_KEY.finditer(text):
+        add("bibtex_keys", m.group(1))
+    for m in BIBTEX_TITLE.finditer(text):
+        add("titles", m.group(1))
+    return facts
+
+def compact_result(content: Any, budget: int = None, text: str = None) -> Tuple[str, Dict[str, List[str]]]:
+    """(texte d'au plus budget caractères pour le transcript, faits saillants)"""
+    budget = budget or int(os.environ.get("TOOL_RESULT_CHARS", 1500))
+    text = result_texts(content) if text is None else text
+    facts = salient(content, text=text)
+    head = json.dumps(facts, ensure_ascii=False)[:budget // 2] if facts else ""
+    # aperçu avec le budget restant (libellés et "…" de summarize compris): seul ce préfixe est encodé
+    labels = len(FACTS_LABEL) + len(PREVIEW_LABEL) if head else 0
+    rest = max(budget - len(head) - labels - 1, 1)
+    preview = summarize(text, rest) if text else summarize(content, rest)
+    return (f"{FACTS_LABEL}{head}{PREVIEW_LABEL}{preview}" if head else preview), facts
+
+def digest(facts: Dict[str, List[str]], limit: int = 300) -> str:
+    """Une ligne pour le résumé glissant"""
+    parts = [f"{field}: {' | '.join(values[:3])}" for field, values in facts.items()]
+    line = "; ".join(parts)
+    return (line[:limit] + "…") if len(line) > limit else line
+
+class Transcript:
+    """Historique complet du run et messages envoyés au LLM: objectif, résumé glissant des
+    étapes anciennes (une ligne par action, au plus summary_chars) et keep_steps dernières étapes."""
+    def __init__(self, goal: str, keep_steps: int = None, summary_chars: int = None):
+        self.goal = {"role": "user", "content": goal}
+        self.keep_steps = keep_steps if keep_steps is not None else int(os.environ.get("TRANSCRIPT_KEEP_STEPS", 2))
+        self.summary_chars = summary_chars or int(os.environ.get("TRANSCRIPT_SUMMARY_CHARS", 2000))
+        self.steps: List[Tuple[List[Dict[str, str]], List[str]]] = []
+        self._summary: deque = deque()
+        self._summary_size = 0
+        self._folded = 0     # étapes passées dans le résumé
+        self._dropped = 0    # lignes de résumé abandonnées faute de place
+
+    def add_step(self, messages: List[Dict[str, str]], digests: List[str]):
+        self.steps.append((messages, digests))
+        # les étapes qui sortent de la fenêtre sont repliées dans le résumé
+        while len(self.steps) - self._folded > self.keep_steps:
+            for line in self.steps[self._folded][1]:
+                line = f"étape {self._folded + 1}: {line}"
+                self._summary.append(line)
+                self._summary_size += len(line) + 1
+            self._folded += 1
+        while self._summary_size > self.summary_chars and len(self._summary) > 1:
+            self._summary_size -= len(self._summary.popleft()) + 1
+            self._dropped += 1
+
+    def prompt(self) -> List[Dict[str, str]]:
+        msgs = [self.goal]
+        if self._summary:
+            older = f"({self._dropped} actions plus anciennes omises)\n" if self._dropped else ""
+            msgs.append({"role": "user", "content": "Résumé des étapes précédentes:\n" + older + "\n".join(self._summary)})
+        for messages, _ in self.steps[self._folded:]:
+            msgs.extend(messages)
+        return msgs
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [self.goal] + [m for messages, _ in self.steps for m in messages]
@@ -0,0 +1,74 @@
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class CompletionCache:
+    """Cache des réponses LLM adressé par contenu: LRU mémoire + SQLite optionnel, avec TTL."""
+    def __init__(self, max_entries: int = None, ttl: float = None, db_path: str = None):
+        self.max_entries = max_entries or int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 256))
+        self.ttl = ttl or float(os.environ.get("LLM_CACHE_TTL", 24 * 3600))
+        self.db_path = db_path or os.environ.get("LLM_CACHE_DB")
+        self.max_db_entries = int(os.environ.get("LLM_CACHE_DB_MAX_ENTRIES", 5000))
+        self.hits = self.disk_hits = self.misses = 0
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.db_path:
+            try:
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions(accessed)")
+                self._db.commit()
+            except sqlite3.Error:
+                self._db = None  # on continue avec le seul cache mémoire
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if now - hit[0] < self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return hit[1]
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._db.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO completions (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                                 (key, json.dumps(value, ensure_ascii=False), now, now))
+                self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+                self._db.execute("DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                                 (self.max_db_entries,))
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, value: Any):
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0, "memory_entries": len(self._mem)}
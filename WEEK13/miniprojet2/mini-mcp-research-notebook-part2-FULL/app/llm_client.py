@@ -1,38 +1,146 @@
-import os, json, httpx
-from typing import List, Dict, Any, Optional
+import os, json, time, asyncio, weakref, httpx
+from typing import List, Dict, Any, Optional, Tuple
+from app.llm_cache import CompletionCache
+
+try:
+    import h2  # noqa: F401  (HTTP/2 pour httpx, extra httpx[http2])
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Un pool de connexions par boucle asyncio: un AsyncClient ne peut pas changer de boucle
+# (Streamlit relance asyncio.run à chaque run)
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 10)),
+                              max_keepalive_connections=int(os.environ.get("LLM_MAX_KEEPALIVE", 5)))
+        client = _ASYNC_CLIENTS[loop] = httpx.AsyncClient(http2=HTTP2, limits=limits,
+                                                          timeout=float(os.environ.get("LLM_TIMEOUT", 90)))
+    return client
+
+async def aclose_clients():
+    """Ferme le pool de la boucle courante (à appeler avant la fin d'asyncio.run)"""
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
 class LLM:
-    def chat_json(self, system: str, messages: List[Dict[str, str]], schema: Optional[Dict]=None) -> Dict:
+    model: str = ""
+    temperature: Optional[float] = None
+    cache: Optional[CompletionCache] = None
+
+    timeout: float = 90.0
+
+    def _lookup(self, system, messages, schema, stats) -> Tuple[Optional[str], Optional[Dict]]:
+        stats["cached"] = False
+        # Même modèle + même prompt + même schéma => même plan: on évite l'aller-retour LLM
+        if self.cache is None:
+            return None, None
+        key = CompletionCache.make_key(backend=type(self).__name__, model=self.model, system=system,
+                                       messages=messages, schema=schema, temperature=self.temperature)
+        hit = self.cache.get(key)
+        if hit is not None:
+            stats["cached"] = True
+        return key, hit
+
+    def chat_json(self, system: str, messages: List[Dict[str, str]], schema: Optional[Dict]=None,
+                  stats: Optional[Dict[str, Any]]=None) -> Dict:
+        # stats (souvent le span "llm") reçoit jetons, octets échangés et temps de parsing
+        stats = stats if stats is not None else {}
+        key, hit = self._lookup(system, messages, schema, stats)
+        if hit is not None:
+            return hit
+        out = self._chat_json(system, messages, schema, stats)
+        if key is not None:
+            self.cache.set(key, out)
+        return out
+
+    async def achat_json(self, system: str, messages: List[Dict[str, str]], schema: Optional[Dict]=None,
+                         stats: Optional[Dict[str, Any]]=None, timeout: Optional[float]=None) -> Dict:
+        """Comme chat_json sans bloquer la boucle; asyncio.TimeoutError au-delà de timeout secondes
+        (self.timeout par défaut). Annuler la tâche annule la requête HTTP en cours."""
+        stats = stats if stats is not None else {}
+        key, hit = self._lookup(system, messages, schema, stats)
+        if hit is not None:
+            return hit
+        out = await asyncio.wait_for(self._achat_json(system, messages, schema, stats),
+                                     timeout if timeout is not None else self.timeout)
+        if key is not None:
+            self.cache.set(key, out)
+        return out
+
+    def _chat_json(self, system: str, messages: List[Dict[str, str]], schema: Optional[Dict]=None,
+                   stats: Optional[Dict[str, Any]]=None) -> Dict:
+        raise NotImplementedError
+
+    async def _achat_json(self, system: str, messages: List[Dict[str, str]], schema: Optional[Dict]=None,
+                          stats: Optional[Dict[str, Any]]=None) -> Dict:
         raise NotImplementedError
 
+def _parse(text: str, stats: Dict[str, Any]) -> Dict:
+    t0 = time.perf_counter()
+    try:
+        return json.loads(text)
+    finally:
+        stats["parse_s"] = round(time.perf_counter() - t0, 6)
+
 class GroqLLM(LLM):
     def __init__(self, model: str):
         from groq import Groq
-        self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+        self.api_key = os.environ.get("GROQ_API_KEY")
+        self.client = Groq(api_key=self.api_key)
         self.model = model
+        self.temperature = 0
+        self._aclient = None
+        self._aclient_http = None
 
-    def chat_json(self, system, messages, schema=None) -> Dict:
+    def _request(self, system, messages, schema) -> Dict[str, Any]:
         resp_fmt = {"type": "json_object"}
         if schema:
             resp_fmt = {"type": "json_schema", "json_schema": {"name":"planner","schema": schema}}
-        r = self.client.chat.completions.create(
-            model=self.model,
-            temperature=0,
-            response_format=resp_fmt,
-            messages=[
-                {"role":"system","content": system},
-                *messages
-            ]
-        )
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "response_format": resp_fmt,
+            "messages": [{"role":"system","content": system}, *messages]
+        }
+
+    def _read(self, r, request, stats) -> Dict:
         text = r.choices[0].message.content
-        return json.loads(text)
+        usage = getattr(r, "usage", None)
+        stats["tokens_in"] = getattr(usage, "prompt_tokens", None)
+        stats["tokens_out"] = getattr(usage, "completion_tokens", None)
+        stats["bytes_out"] = len(json.dumps(request["messages"], ensure_ascii=False).encode("utf-8"))
+        stats["bytes_in"] = len((text or "").encode("utf-8"))
+        return _parse(text, stats)
+
+    def _chat_json(self, system, messages, schema=None, stats=None) -> Dict:
+        stats = stats if stats is not None else {}
+        request = self._request(system, messages, schema)
+        return self._read(self.client.chat.completions.create(**request), request, stats)
+
+    async def _achat_json(self, system, messages, schema=None, stats=None) -> Dict:
+        stats = stats if stats is not None else {}
+        http = get_async_client()
+        # AsyncGroq lié au pool de la boucle courante
+        if self._aclient_http is not http:
+            from groq import AsyncGroq
+            self._aclient = AsyncGroq(api_key=self.api_key, http_client=http)
+            self._aclient_http = http
+        request = self._request(system, messages, schema)
+        return self._read(await self._aclient.chat.completions.create(**request), request, stats)
 
 class OllamaLLM(LLM):
     def __init__(self, model: str, host: str="http://localhost:11434"):
         self.model = model
         self.host = host.rstrip("/")
+        self._client: Optional[httpx.Client] = None
 
-    def chat_json(self, system, messages, schema=None) -> Dict:
+    def _body(self, system, messages, schema) -> bytes:
         payload = {
             "model": self.model,
             "messages": [{"role":"system","content":system}, *messages],
@@ -40,36 +148,81 @@ class OllamaLLM(LLM):
         }
         if schema:
             payload["format"] = schema  # JSON Schema
-        with httpx.Client(timeout=90.0) as c:
-            r = c.post(f"{self.host}/api/chat", json=payload)
-            r.raise_for_status()
-            data = r.json()
-            text = data["message"]["content"]
-            return json.loads(text)
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def _read(self, r, body, stats) -> Dict:
+        r.raise_for_status()
+        data = r.json()
+        text = data["message"]["content"]
+        stats["tokens_in"] = data.get("prompt_eval_count")
+        stats["tokens_out"] = data.get("eval_count")
+        stats["bytes_out"] = len(body)
+        stats["bytes_in"] = len(r.content)
+        return _parse(text, stats)
+
+    def _chat_json(self, system, messages, schema=None, stats=None) -> Dict:
+        stats = stats if stats is not None else {}
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        body = self._body(system, messages, schema)
+        r = self._client.post(f"{self.host}/api/chat", content=body, headers={"Content-Type": "application/json"})
+        return self._read(r, body, stats)
+
+    async def _achat_json(self, system, messages, schema=None, stats=None) -> Dict:
+        stats = stats if stats is not None else {}
+        body = self._body(system, messages, schema)
+        r = await get_async_client().post(f"{self.host}/api/chat", content=body,
+                                          headers={"Content-Type": "application/json"})
+        return self._read(r, body, stats)
+
+_CACHE: Optional[CompletionCache] = None
+
+def get_cache() -> Optional[CompletionCache]:
+    global _CACHE
+    if _CACHE is None and os.environ.get("LLM_CACHE", "true").lower() in ("1", "true", "yes"):
+        _CACHE = CompletionCache()
+    return _CACHE
+
+_LLMS: Dict[Tuple[str, ...], LLM] = {}
 
 def build_llm() -> LLM:
+    """Une instance par backend + modèle (+ hôte Ollama), partagée entre les runs"""
     backend = os.environ.get("LLM_BACKEND", "groq").lower()
     if backend == "ollama":
-        return OllamaLLM(
-            model=os.environ.get("OLLAMA_MODEL", "llama3.1"),
-            host=os.environ.get("OLLAMA_HOST", "http://localhost:11434"),
-        )
+        model = os.environ.get("OLLAMA_MODEL", "llama3.1")
+        host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+        key = (backend, model, host)
+        if key not in _LLMS:
+            _LLMS[key] = OllamaLLM(model=model, host=host)
     else:
-        return GroqLLM(model=os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile"))
+        model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+        key = ("groq", model)
+        if key not in _LLMS:
+            _LLMS[key] = GroqLLM(model=model)
+    llm = _LLMS[key]
+    llm.cache = get_cache()
+    llm.timeout = float(os.environ.get("LLM_TIMEOUT", 90))
+    return llm
+
+_ACTION = {
+  "type":"object",
+  "properties": {
+    "id": {"type":"string"},
+    "server": {"type":"string"},
+    "tool": {"type":"string"},
+    "args": {"type":"object"},
+    "depends_on": {"type":"array", "items": {"type":"string"}}
+  },
+  "required":["server","tool","args"]
+}
 
 PLANNER_SCHEMA = {
   "type": "object",
   "properties": {
     "decision": {"type":"string", "enum":["call_tool","final_answer"]},
-    "action": {
-      "type":"object",
-      "properties": {
-        "server": {"type":"string"},
-        "tool": {"type":"string"},
-        "args": {"type":"object"}
-      },
-      "required":["server","tool","args"]
-    },
+    "action": _ACTION,
+    # plan en DAG: les actions sans dépendance en attente s'exécutent en parallèle
+    "actions": {"type":"array", "items": _ACTION},
     "notes": {"type":"string"}
   },
   "required":["decision"]
@@ -1,11 +1,32 @@
-import os, json, time
-from typing import Any
+import os, json, math, time, uuid, weakref, itertools, contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# span englobant courant (propagé aux tâches asyncio créées à l'intérieur)
+_current_span = contextvars.ContextVar("current_span", default=None)
+# sink de ce span: un MCPHub partagé entre plusieurs runs écrit les spans d'outil dans le bon fichier
+_current_sink = contextvars.ContextVar("current_sink", default=None)
+
+SUMMARY_CHARS = int(os.environ.get("LOG_SUMMARY_CHARS", 700))
 
 class LogSink:
-    def __init__(self, base_dir: str = None):
+    """Fichier JSONL d'un run, ouvert une seule fois et vidé par lots."""
+    def __init__(self, base_dir: str = None, flush_every: int = None, flush_interval: float = None,
+                 name: str = "run"):
         self.base = base_dir or os.environ.get("LOGS_DIR", "./logs")
         os.makedirs(self.base, exist_ok=True)
-        self.path = os.path.join(self.base, f"run_{int(time.time())}.jsonl")
+        # suffixe aléatoire: plusieurs runs peuvent démarrer dans la même seconde (mode batch)
+        self.path = os.path.join(self.base, f"{name}_{int(time.time())}_{uuid.uuid4().hex[:6]}.jsonl")
+        self.flush_every = flush_every or int(os.environ.get("LOG_FLUSH_EVERY", 20))
+        self.flush_interval = flush_interval or float(os.environ.get("LOG_FLUSH_INTERVAL", 2.0))
+        self._f = open(self.path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._t0 = time.perf_counter()
+        self._ids = itertools.count(1)
+        self.spans: List[Dict[str, Any]] = []
+        # ferme (et vide) le fichier si le sink est abandonné sans close()
+        self._finalizer = weakref.finalize(self, self._f.close)
 
     def write(self, kind: str, server: str, tool: str, args: dict, output: Any, elapsed: float, success: bool):
         rec = {
@@ -14,16 +35,156 @@ class LogSink:
             "server": server,
             "tool": tool,
             "args": _redact(args),
-            "output_summary": _summ(output),
+            "output_summary": summarize(output),
             "elapsed_s": round(elapsed, 3),
             "success": success
         }
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._write_line(rec)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Mesure un bloc (run, step, llm, tool...). Le dict produit accepte des attributs
+        supplémentaires (jetons, octets, attente...); il est écrit dans le JSONL à la sortie."""
+        rec = {"name": name, "span_id": next(self._ids), "parent_id": _current_span.get(), **attrs}
+        token = _current_span.set(rec["span_id"])
+        sink_token = _current_sink.set(self)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        except BaseException as e:
+            rec.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            _current_sink.reset(sink_token)
+            rec["start_s"] = round(t0 - self._t0, 4)
+            rec["duration_s"] = round(time.perf_counter() - t0, 4)
+            self.spans.append(rec)
+            self._write_line({"ts": time.strftime('%Y-%m-%dT%H:%M:%S'), "kind": "span", **rec})
+
+    def summary(self) -> Dict[str, Any]:
+        """Agrégats du run: temps par type de span, p50/p95 par outil, jetons LLM"""
+        by_name: Dict[str, float] = {}
+        tools: Dict[str, List[Dict[str, Any]]] = {}
+        llm = [s for s in self.spans if s["name"] == "llm"]
+        for s in self.spans:
+            by_name[s["name"]] = round(by_name.get(s["name"], 0.0) + s["duration_s"], 4)
+            if s["name"] == "tool":
+                tools.setdefault(f"{s.get('server')}.{s.get('tool')}", []).append(s)
+        return {
+            "total_s": round(sum(s["duration_s"] for s in self.spans if s["parent_id"] is None), 4),
+            "time_by_span": by_name,
+            "tools": {name: _stats(calls) for name, calls in tools.items()},
+            "llm": {
+                **_stats(llm),
+                "cached": sum(1 for s in llm if s.get("cached")),
+                "tokens_in": sum(s.get("tokens_in") or 0 for s in llm),
+                "tokens_out": sum(s.get("tokens_out") or 0 for s in llm),
+                # estimations: part du prompt système et de la liste d'outils dans tokens_in
+                "system_tokens": sum(s.get("system_tokens") or 0 for s in llm),
+                "spec_tokens": sum(s.get("spec_tokens") or 0 for s in llm),
+                "transcript_tokens": sum(s.get("transcript_tokens") or 0 for s in llm),
+                "parse_s": round(sum(s.get("parse_s") or 0 for s in llm), 4)
+            }
+        }
+
+    def write_summary(self) -> Dict[str, Any]:
+        summary = self.summary()
+        self._write_line({"ts": time.strftime('%Y-%m-%dT%H:%M:%S'), "kind": "run_summary", **summary})
+        self.flush()
+        return summary
+
+    def _write_line(self, rec: Dict[str, Any]):
+        self._f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._f.closed:
+            self._f.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def current_sink() -> "LogSink":
+    """Sink du span englobant (None hors de tout span)"""
+    return _current_sink.get()
+
+@contextmanager
+def null_span(name: str, **attrs):
+    """Remplace LogSink.span quand aucun sink n'est fourni"""
+    yield dict(name=name, **attrs)
+
+def _percentile(values: List[float], q: float) -> float:
+    # rang le plus proche
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)] if ordered else 0.0
+
+def _stats(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    durations = [s["duration_s"] for s in spans]
+    return {
+        "count": len(spans),
+        "errors": sum(1 for s in spans if s.get("error") or s.get("success") is False),
+        "total_s": round(sum(durations), 4),
+        "p50_s": _percentile(durations, 0.50),
+        "p95_s": _percentile(durations, 0.95),
+        "max_s": max(durations, default=0.0),
+        "queue_wait_s": round(sum(s.get("queue_wait_s") or 0 for s in spans), 4),
+        "bytes_in": sum(s.get("bytes_in") or 0 for s in spans),
+        "bytes_out": sum(s.get("bytes_out") or 0 for s in spans)
+    }
+
+def _iter_json(o: Any, clip: int) -> Iterator[str]:
+    """Encode o en JSON morceau par morceau; les chaînes sont coupées à clip caractères.
+    Le début du texte produit est identique à json.dumps(o) tant qu'on s'arrête dès que
+    clip caractères ont été émis."""
+    if isinstance(o, str):
+        yield json.dumps(o[:clip] if len(o) > clip else o, ensure_ascii=False)
+    elif o is None or isinstance(o, (bool, int, float)):
+        yield json.dumps(o)
+    elif isinstance(o, dict):
+        yield "{"
+        for i, (k, v) in enumerate(o.items()):
+            key = k if isinstance(k, str) else json.dumps(k)
+            yield (", " if i else "") + json.dumps(key, ensure_ascii=False) + ": "
+            yield from _iter_json(v, clip)
+        yield "}"
+    elif isinstance(o, (list, tuple)):
+        yield "["
+        for i, v in enumerate(o):
+            if i:
+                yield ", "
+            yield from _iter_json(v, clip)
+        yield "]"
+    elif hasattr(o, "model_dump"):  # contenus MCP (pydantic)
+        yield from _iter_json(o.model_dump(), clip)
+    else:
+        yield json.dumps(str(o), ensure_ascii=False)
 
-def _summ(o: Any) -> str:
-    t = json.dumps(o, ensure_ascii=False) if not isinstance(o, str) else o
-    return (t[:700] + "…") if len(t) > 700 else t
+def summarize(o: Any, limit: int = None) -> str:
+    limit = limit or SUMMARY_CHARS
+    if isinstance(o, str):
+        return (o[:limit] + "…") if len(o) > limit else o
+    # on arrête l'encodage dès que le budget est dépassé
+    parts, size = [], 0
+    for piece in _iter_json(o, limit + 1):
+        parts.append(piece)
+        size += len(piece)
+        if size > limit:
+            break
+    t = "".join(parts)
+    return (t[:limit] + "…") if size > limit else t
 
 def _redact(d: dict) -> dict:
     HIDDEN = {"api_key", "token", "authorization", "password", "secret", "GROQ_API_KEY"}
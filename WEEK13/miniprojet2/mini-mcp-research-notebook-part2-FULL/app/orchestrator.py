@@ -1,103 +1,435 @@
-import os, json, asyncio, time
-from contextlib import AsyncExitStack
+import os, re, json, asyncio, time, hashlib
+from collections import OrderedDict, deque
 from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
 from app.llm_client import build_llm, PLANNER_SCHEMA
-from app.log_utils import LogSink
+from app.log_utils import LogSink, null_span, current_sink
+from app.compaction import Transcript, compact_result, digest, result_texts
 
-from mcp import ClientSession, Tool
+from mcp import ClientSession, Tool, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from mcp.client import StdioServerParameters
 
 load_dotenv()
 
+def _content_bytes(result: Any) -> int:
+    # taille des contenus texte renvoyés par un outil MCP, sans resérialiser
+    return sum(len((getattr(c, "text", None) or "").encode("utf-8")) for c in (getattr(result, "content", None) or []))
+
+class FairSlots:
+    """Sémaphore d'un serveur qui sert ses files d'attente à tour de rôle, une par propriétaire
+    (un run): un run qui lance huit lectures ne fait pas attendre les autres derrière lui."""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.queues: "OrderedDict[Any, deque]" = OrderedDict()
+
+    async def acquire(self, owner: Any = None):
+        if self.active < self.limit and not self.queues:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(owner, deque()).append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # place accordée juste avant l'annulation
+            else:
+                q = self.queues.get(owner)
+                if q is not None and fut in q:
+                    q.remove(fut)
+                    if not q:
+                        del self.queues[owner]
+            raise
+
+    def release(self):
+        # la place passe directement au prochain propriétaire dans l'ordre circulaire
+        while self.queues:
+            owner, q = next(iter(self.queues.items()))
+            fut = q.popleft()
+            if q:
+                self.queues.move_to_end(owner)
+            else:
+                del self.queues[owner]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
 class MCPHub:
-    def __init__(self, config: Dict[str, Any]):
+    """Sessions MCP démarrées en parallèle; en mode lazy, un serveur dont les outils figurent
+    dans le manifeste n'est lancé qu'au premier appel d'un de ses outils."""
+    def __init__(self, config: Dict[str, Any], logs: LogSink = None, lazy: bool = None):
         self.cfg = config
         self.sessions: Dict[str, ClientSession] = {}
-        self.exit_stack = AsyncExitStack()
         self.tools: Dict[Tuple[str,str], Tool] = {}
+        self._span = logs.span if logs else null_span
+        self.lazy = lazy if lazy is not None else os.environ.get("MCP_LAZY", "false").lower() in ("1", "true", "yes")
+        self.manifest_path = os.environ.get("MCP_MANIFEST", ".mcp_manifest.json")
+        self.startup_timeout = float(os.environ.get("MCP_STARTUP_TIMEOUT", 60))
+        # appels simultanés par serveur; l'attente sur ce sémaphore est mesurée (queue_wait_s)
+        self.server_concurrency = int(os.environ.get("MCP_SERVER_CONCURRENCY", 2))
+        self._slots: Dict[str, FairSlots] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stops: Dict[str, asyncio.Event] = {}
+        self._manifest: Dict[str, Any] = {}
+        # spec des outils: "names", "short" ou "full" (avec inputSchema)
+        self.spec_verbosity = os.environ.get("MCP_TOOL_SPEC", "short")
+        self._spec_lines: Dict[Tuple[Tuple[str,str], str], str] = {}   # ligne par outil et verbosité
+        self._spec_cache: Dict[Tuple[str, Tuple], str] = {}            # spec assemblée, vidée si self.tools change
+        self._tool_words: Dict[Tuple[str,str], set] = {}
+
+    def span(self, name: str, **attrs):
+        # hub partagé (batch): les spans vont dans le sink du run appelant, sinon dans celui du hub
+        sink = current_sink()
+        return (sink.span if sink is not None else self._span)(name, **attrs)
 
     async def start(self):
-        for name, desc in self.cfg.items():
-            cmd = desc["command"]
-            args = [self._expand(a) for a in desc.get("args", [])]
-            params = StdioServerParameters(command=cmd, args=args)
-            read_stream, write_stream = await stdio_client(params)
-            session = ClientSession(read_stream, write_stream)
-            await self.exit_stack.enter_async_context(session)
-            await session.initialize()
+        with self.span("hub.start", servers=len(self.cfg), lazy=self.lazy) as sp:
+            self._manifest = self._load_manifest()
+            eager = []
+            for name, desc in self.cfg.items():
+                entry = self._manifest.get(name)
+                if self.lazy and entry and entry.get("fingerprint") == _fingerprint(desc):
+                    self._register(name, [Tool.model_validate(t) for t in entry["tools"]])
+                else:
+                    eager.append(name)
+            sp["deferred"] = len(self.cfg) - len(eager)
+            # un serveur en échec n'empêche pas les autres de démarrer (erreur dans son span)
+            await asyncio.gather(*(self._spawn(name) for name in eager), return_exceptions=True)
+            self._save_manifest()
+
+    async def _spawn(self, name: str, lazy: bool = False) -> ClientSession:
+        with self.span("server.start", server=name, lazy=lazy) as sp:
+            ready = asyncio.get_running_loop().create_future()
+            stop = asyncio.Event()
+            task = asyncio.create_task(self._run_server(name, ready, stop))
+            try:
+                session, tools = await asyncio.wait_for(asyncio.shield(ready), self.startup_timeout)
+            except BaseException:
+                ready.cancel()
+                stop.set()
+                task.cancel()
+                raise
+            self._tasks[name], self._stops[name] = task, stop
             self.sessions[name] = session
-            resp = await session.list_tools()
-            for t in resp.tools:
-                self.tools[(name, t.name)] = t
+            self._register(name, tools)
+            self._manifest[name] = {"fingerprint": _fingerprint(self.cfg[name]),
+                                    "tools": [t.model_dump(mode="json", exclude_none=True) for t in tools]}
+            sp["tools"] = len(tools)
+            return session
+
+    async def _run_server(self, name: str, ready: asyncio.Future, stop: asyncio.Event):
+        # stdio_client et ClientSession doivent être ouverts et fermés dans la même tâche
+        desc = self.cfg[name]
+        params = StdioServerParameters(command=desc["command"], args=[self._expand(a) for a in desc.get("args", [])])
+        try:
+            async with stdio_client(params) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    resp = await session.list_tools()
+                    ready.set_result((session, resp.tools))
+                    await stop.wait()
+        except asyncio.CancelledError:
+            ready.cancel()
+            raise
+        except Exception as e:
+            while getattr(e, "exceptions", None):  # groupes de tâches anyio
+                e = e.exceptions[0]
+            if not ready.done():
+                ready.set_exception(RuntimeError(f"Serveur MCP '{name}' indisponible: {e}"))
+        finally:
+            # serveur arrêté ou planté: il sera relancé au prochain appel
+            if self._stops.get(name) is stop:
+                self.sessions.pop(name, None)
+                self._tasks.pop(name, None)
+                self._stops.pop(name, None)
+
+    async def _ensure(self, server: str) -> ClientSession:
+        session = self.sessions.get(server)
+        if session is not None:
+            return session
+        if server not in self.cfg:
+            raise KeyError(f"Serveur MCP inconnu: {server}")
+        async with self._locks.setdefault(server, asyncio.Lock()):
+            if server not in self.sessions:
+                await self._spawn(server, lazy=True)
+                self._save_manifest()
+        return self.sessions[server]
+
+    def _register(self, name: str, tools: List[Tool]):
+        for key in [k for k in self.tools if k[0] == name]:
+            del self.tools[key]
+        for t in tools:
+            self.tools[(name, t.name)] = t
+        # seules les lignes de ce serveur sont à refaire
+        for k in [k for k in self._spec_lines if k[0][0] == name]:
+            del self._spec_lines[k]
+        for k in [k for k in self._tool_words if k[0] == name]:
+            del self._tool_words[k]
+        self._spec_cache.clear()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        try:
+            with open(self.manifest_path, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f, ensure_ascii=False)
+        except OSError:
+            pass  # le manifeste n'est qu'une optimisation
 
     async def stop(self):
-        await self.exit_stack.aclose()
+        for stop in list(self._stops.values()):
+            stop.set()
+        tasks = list(self._tasks.values())
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=10)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def call(self, server: str, tool: str, args: Dict[str, Any]) -> Any:
-        session = self.sessions[server]
-        return await asyncio.wait_for(session.call_tool(tool, args), timeout=120)
+        with self.span("tool", server=server, tool=tool) as sp:
+            session = await self._ensure(server)
+            sp["bytes_out"] = len(json.dumps(args, ensure_ascii=False, default=str).encode("utf-8"))
+            slots = self._slots.get(server)
+            if slots is None:
+                slots = self._slots[server] = FairSlots(self.server_concurrency)
+            # propriétaire = JSONL du run appelant: unique, contrairement à id() d'un sink fermé
+            sink = current_sink()
+            t0 = time.perf_counter()
+            await slots.acquire(sink.path if sink is not None else None)
+            try:
+                sp["queue_wait_s"] = round(time.perf_counter() - t0, 4)
+                result = await asyncio.wait_for(session.call_tool(tool, args), timeout=120)
+            finally:
+                slots.release()
+            sp["bytes_in"] = _content_bytes(result)
+            sp["success"] = not getattr(result, "isError", False)
+            return result
+
+    def available_tools_spec(self, verbosity: str = None, query: str = None, limit: int = 0) -> str:
+        """Liste des outils pour le prompt, mise en cache jusqu'au prochain changement de self.tools.
+        Avec query et limit, seuls les limit outils les plus pertinents pour query sont listés."""
+        verbosity = verbosity or self.spec_verbosity
+        keys = tuple(self.relevant_tools(query, limit) if query and limit else self.tools)
+        spec = self._spec_cache.get((verbosity, keys))
+        if spec is None:
+            if len(self._spec_cache) > 64:
+                self._spec_cache.clear()
+            lines = []
+            for key in keys:
+                line = self._spec_lines.get((key, verbosity))
+                if line is None:
+                    line = self._spec_lines[(key, verbosity)] = _spec_line(key, self.tools[key], verbosity)
+                lines.append(line)
+            spec = self._spec_cache[(verbosity, keys)] = "\n".join(lines)
+        return spec
 
-    def available_tools_spec(self) -> str:
-        lines = []
-        for (srv, name), t in self.tools.items():
-            desc = t.description or ""
-            lines.append(f"- {srv}.{name}: {desc}")
-        return "\\n".join(lines)
+    def relevant_tools(self, query: str, limit: int) -> List[Tuple[str,str]]:
+        """Outils classés par mots communs avec query (nom, serveur, description); tous si aucun ne correspond"""
+        words = _words(query)
+        scores = {}
+        for key, t in self.tools.items():
+            tool_words = self._tool_words.get(key)
+            if tool_words is None:
+                tool_words = self._tool_words[key] = _words(f"{key[0]} {key[1]} {t.description or ''}")
+            score = len(words & tool_words)
+            if score:
+                scores[key] = score
+        if not scores:
+            return list(self.tools)
+        return sorted(scores, key=lambda k: -scores[k])[:limit]
 
     def _expand(self, s: str) -> str:
         return os.path.expandvars(s)
 
+def _fingerprint(desc: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(desc, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _words(text: str) -> set:
+    return {w for w in re.findall(r"[a-zà-ÿ0-9]+", text.lower().replace("_", " ")) if len(w) > 2}
+
+def _spec_line(key: Tuple[str,str], t: Tool, verbosity: str) -> str:
+    name = f"- {key[0]}.{key[1]}"
+    if verbosity == "names":
+        return name
+    desc = (t.description or "").strip()
+    if verbosity == "full":
+        schema = json.dumps(t.inputSchema or {}, ensure_ascii=False, separators=(",", ":"))
+        return f"{name}: {desc}\n  args: {schema}"
+    first = desc.split("\n", 1)[0]
+    return f"{name}: {first[:160]}"
+
+def estimate_tokens(text: str) -> int:
+    # ~4 octets par jeton: suffisant pour suivre la taille du prompt d'une étape à l'autre
+    return (len(text.encode("utf-8")) + 3) // 4
+
+# "${a1}" dans les args d'une action = texte du résultat de l'action a1;
+# "${a1.papers[0].id}" = valeur scalaire à ce chemin dans le résultat JSON de a1
+REF = re.compile(r"\$\{([\w-]+)((?:\.\w+|\[\d+\])*)\}")
+PATH_STEP = re.compile(r"\.(\w+)|\[(\d+)\]")
+
+def _resolve(ref: str, path: str, outputs: Dict[str, str]) -> Any:
+    text = outputs[ref]
+    if not path:
+        return text
+    try:
+        value = json.loads(text)
+    except ValueError:
+        raise ValueError(f"${{{ref}{path}}}: le résultat de {ref} n'est pas du JSON") from None
+    for key, index in PATH_STEP.findall(path):
+        try:
+            value = value[int(index)] if index else value[key]
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f"${{{ref}{path}}}: chemin introuvable dans le résultat de {ref}") from None
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"${{{ref}{path}}}: désigne un objet ou une liste, pas une valeur scalaire")
+    return value
+
+def _substitute(o: Any, outputs: Dict[str, str]) -> Any:
+    if isinstance(o, str):
+        m = REF.fullmatch(o)
+        if m and m.group(1) in outputs:
+            return _resolve(m.group(1), m.group(2), outputs)  # garde le type (nombre, booléen)
+        def one(m):
+            if m.group(1) not in outputs:
+                return m.group(0)
+            value = _resolve(m.group(1), m.group(2), outputs)
+            return value if isinstance(value, str) else json.dumps(value)
+        return REF.sub(one, o)
+    if isinstance(o, dict):
+        return {k: _substitute(v, outputs) for k, v in o.items()}
+    if isinstance(o, list):
+        return [_substitute(v, outputs) for v in o]
+    return o
+
+def plan_actions(plan: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    """Actions du plan ("actions" ou l'ancienne forme "action"), avec id et depends_on normalisés"""
+    actions = plan.get("actions") or ([plan["action"]] if plan.get("action") else [])
+    out = []
+    for i, a in enumerate([a for a in actions if isinstance(a, dict)][:limit]):
+        deps = a.get("depends_on") or []
+        out.append({"id": str(a.get("id") or f"a{i+1}"), "server": a.get("server"), "tool": a.get("tool"),
+                    "args": a.get("args") or {}, "depends_on": [str(d) for d in deps] if isinstance(deps, list) else [str(deps)]})
+    return out
+
 class Orchestrator:
     def __init__(self, hub: MCPHub, logs: LogSink):
         self.hub = hub
         self.llm = build_llm()
         self.logs = logs
+        self.max_actions = int(os.environ.get("MAX_PLAN_ACTIONS", 8))
+        # 0: tous les outils à chaque étape; sinon les N plus pertinents pour l'objectif et le dernier message
+        self.tool_limit = int(os.environ.get("MCP_TOOL_LIMIT", 0))
+        self._system: Tuple[str, str] = None
+
+    def _system_prompt(self, spec: str) -> str:
+        # reconstruit seulement quand la spec des outils change
+        if self._system is None or self._system[0] != spec:
+            self._system = (spec, (
+                "Tu disposes des outils MCP suivants:\n" + spec +
+                "\nDécide du prochain appel d’outil ou fournis la réponse finale. Réponds STRICTEMENT au format JSON.\n"
+                "Stratégie suggérée pour un brief enrichi:\n"
+                "- arxiv.search_papers → arxiv.read_paper pour 2–3 papiers pertinents\n"
+                "- scholarplus.enrich_metadata pour compléter DOI/BibTeX\n"
+                "- cite.assemble_brief puis cite.clean_citations\n"
+                "- scholarplus.generate_bibtex pour les entrées manquantes\n"
+                "- fs.write_file pour sauvegarder le Markdown final\n"
+                f"Tu peux planifier jusqu'à {self.max_actions} actions d'un coup dans \"actions\", chacune avec un \"id\" "
+                "et \"depends_on\" (ids des actions à terminer avant elle): les actions prêtes sont exécutées en parallèle "
+                "et tu n'es rappelé qu'après la dernière, ou dès qu'une action échoue. "
+                "Dans args, \"${id}\" est remplacé par tout le texte du résultat de l'action id, et "
+                "\"${id.champ[0].sous_champ}\" par la seule valeur (texte, nombre) à ce chemin dans son résultat JSON; "
+                "un chemin qui désigne un objet ou une liste fait échouer l'action."
+            ))
+        return self._system[1]
 
     async def run_goal(self, user_goal: str, max_steps: int = None) -> Dict[str, Any]:
         max_steps = max_steps or int(os.environ.get("MAX_STEPS", 6))
-        transcript: List[Dict[str, str]] = [
-            {"role":"user","content": user_goal}
-        ]
+        with self.logs.span("run", max_steps=max_steps):
+            result = await self._run_goal(user_goal, max_steps)
+        # résumé agrégé écrit en fin de JSONL et renvoyé à l'UI
+        result["metrics"] = self.logs.write_summary()
+        return result
+
+    async def _run_goal(self, user_goal: str, max_steps: int) -> Dict[str, Any]:
+        # prompt borné: objectif + résumé glissant + dernières étapes, quel que soit max_steps
+        transcript = Transcript(user_goal)
         final_answer = None
         for step in range(1, max_steps+1):
-            system = (
-              "Tu disposes des outils MCP suivants:\\n" +
-              self.hub.available_tools_spec() +
-              "\\nDécide du prochain appel d’outil ou fournis la réponse finale. Réponds STRICTEMENT au format JSON.\\n"
-              "Stratégie suggérée pour un brief enrichi:\\n"
-              "- arxiv.search_papers → arxiv.read_paper pour 2–3 papiers pertinents\\n"
-              "- scholarplus.enrich_metadata pour compléter DOI/BibTeX\\n"
-              "- cite.assemble_brief puis cite.clean_citations\\n"
-              "- scholarplus.generate_bibtex pour les entrées manquantes\\n"
-              "- fs.write_file pour sauvegarder le Markdown final"
-            )
-            plan = self.llm.chat_json(system, transcript, schema=PLANNER_SCHEMA)
-            decision = plan.get("decision")
-            if decision == "final_answer":
-                final_answer = plan.get("notes", "(pas de contenu)")
+            with self.logs.span("step", step=step):
+                messages = transcript.prompt()
+                query = f"{user_goal}\n{messages[-1]['content'][:500]}" if self.tool_limit else None
+                spec = self.hub.available_tools_spec(query=query, limit=self.tool_limit)
+                system = self._system_prompt(spec)
+                with self.logs.span("llm", model=self.llm.model, spec_tokens=estimate_tokens(spec),
+                                    system_tokens=estimate_tokens(system),
+                                    transcript_tokens=estimate_tokens("".join(m["content"] for m in messages))) as sp:
+                    plan = await self.llm.achat_json(system, messages, schema=PLANNER_SCHEMA, stats=sp)
+                decision = plan.get("decision")
+                if decision == "final_answer":
+                    final_answer = plan.get("notes", "(pas de contenu)")
+                    break
+                transcript.add_step(*await self._run_plan(plan_actions(plan, self.max_actions)))
+        return {"final": final_answer, "transcript": transcript.messages()}
+
+    async def _run_plan(self, actions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], List[str]]:
+        # exécution par couches: toutes les actions dont les dépendances ont réussi partent ensemble;
+        # à la première erreur, la couche en cours se termine et la main revient au LLM
+        outputs: Dict[str, str] = {}
+        messages: List[Dict[str, str]] = []
+        digests: List[str] = []
+        pending = actions
+        failed = False
+        while pending and not failed:
+            ready = [a for a in pending if all(d in outputs for d in a["depends_on"])]
+            if not ready:
                 break
-            action = plan.get("action", {})
-            server, tool, args = action.get("server"), action.get("tool"), action.get("args", {})
-            t0 = time.time()
-            try:
-                result = await self.hub.call(server, tool, args)
-                elapsed = time.time()-t0
-                # result.content existe sur les ToolResponse; sinon fallback str(result)
-                content = getattr(result, "content", result)
-                try:
-                    snippet = json.dumps(content)[:1500]
-                except Exception:
-                    snippet = str(content)[:1500]
-                transcript.append({"role":"assistant","content": f"TOOL {server}.{tool} OK"})
-                transcript.append({"role":"user","content": f"Résultat outil (résumé): {snippet}"})
-                self.logs.write("tool_call", server, tool, args, content, elapsed, success=True)
-            except Exception as e:
-                elapsed = time.time()-t0
-                msg = f"Erreur {server}.{tool}: {e}"
-                transcript.append({"role":"assistant","content": msg})
-                self.logs.write("tool_call", server, tool, args, {"error": str(e)}, elapsed, success=False)
-                # boucle continue, le LLM adaptera l'étape suivante
-                continue
-        return {"final": final_answer, "transcript": transcript}
+            started = {id(a) for a in ready}
+            pending = [a for a in pending if id(a) not in started]
+            done = await asyncio.gather(*(self._run_action(a, outputs) for a in ready))
+            for a, (ok, text, msgs, line) in zip(ready, done):
+                messages.extend(msgs)
+                digests.append(line)
+                if ok:
+                    outputs[a["id"]] = text
+                else:
+                    failed = True
+        if pending:
+            skipped = ", ".join(f"{a['id']} ({a['server']}.{a['tool']})" for a in pending)
+            messages.append({"role":"user","content": f"Actions non exécutées: {skipped}"})
+            digests.append(f"non exécutées: {skipped}")
+        return messages, digests
+
+    async def _run_action(self, action: Dict[str, Any], outputs: Dict[str, str]) -> Tuple[bool, str, List[Dict[str, str]], str]:
+        server, tool = action["server"], action["tool"]
+        args = action["args"]
+        t0 = time.time()
+        try:
+            args = _substitute(args, outputs)
+            result = await self.hub.call(server, tool, args)
+            elapsed = time.time()-t0
+            # result.content existe sur les ToolResponse; sinon fallback str(result)
+            content = getattr(result, "content", result)
+            text = result_texts(content)  # texte complet joint une seule fois
+            snippet, facts = compact_result(content, text=text)
+            ok = not getattr(result, "isError", False)
+            status = "OK" if ok else "ERREUR"
+            self.logs.write("tool_call", server, tool, args, content, elapsed, success=ok)
+            return ok, text, [
+                {"role":"assistant","content": f"TOOL {server}.{tool} {status} (id {action['id']})"},
+                {"role":"user","content": f"Résultat outil (résumé): {snippet}"}
+            ], f"{server}.{tool} {status} {digest(facts)}".rstrip()
+        except Exception as e:
+            elapsed = time.time()-t0
+            self.logs.write("tool_call", server, tool, args, {"error": str(e)}, elapsed, success=False)
+            # le LLM adaptera l'étape suivante
+            msg = f"Erreur {server}.{tool} (id {action['id']}): {e}"
+            return False, "", [{"role":"assistant","content": msg}], msg[:300]
@@ -0,0 +1,10 @@
+from app.batch import parse_goals, read_goals, slugify
+
+def test_read_goals_skips_blanks_and_comments(tmp_path):
+    path = tmp_path / "goals.txt"
+    path.write_text("# lot du lundi\nTransformers pour la chimie\n\n   \n  # commentaire indenté\n  GNN et molécules  \n", encoding="utf-8")
+    assert read_goals(str(path)) == parse_goals(path.read_text(encoding="utf-8")) == ["Transformers pour la chimie", "GNN et molécules"]
+
+def test_slugify_is_unique_per_batch():
+    used = set()
+    assert [slugify(g, used) for g in ["GNN & molécules", "gnn molécules", "???"]] == ["gnn-mol-cules", "gnn-mol-cules-2", "brief"]
@@ -0,0 +1,51 @@
+import json
+from types import SimpleNamespace
+from app.compaction import Transcript, compact_result, salient, digest
+
+def text(s):
+    return [SimpleNamespace(text=s)]
+
+def step(n):
+    return [{"role": "assistant", "content": f"TOOL arxiv.read OK (id a{n})"},
+            {"role": "user", "content": f"Résultat {n}"}], [f"arxiv.read OK ids: 2401.0000{n}"]
+
+def test_transcript_keeps_last_steps_and_folds_older_ones():
+    t = Transcript("objectif", keep_steps=2, summary_chars=2000)
+    for n in range(1, 5):
+        t.add_step(*step(n))
+    prompt = t.prompt()
+    assert prompt[0] == {"role": "user", "content": "objectif"}
+    assert "étape 1: arxiv.read OK ids: 2401.00001" in prompt[1]["content"]
+    assert "étape 2:" in prompt[1]["content"] and "étape 3:" not in prompt[1]["content"]
+    assert [m["content"] for m in prompt[2:]] == ["TOOL arxiv.read OK (id a3)", "Résultat 3",
+                                                  "TOOL arxiv.read OK (id a4)", "Résultat 4"]
+    # l'historique complet reste disponible pour l'UI
+    assert len(t.messages()) == 1 + 4 * 2
+
+def test_transcript_summary_is_bounded():
+    t = Transcript("objectif", keep_steps=0, summary_chars=100)
+    for n in range(1, 30):
+        t.add_step(*step(n))
+    summary = t.prompt()[1]["content"]
+    assert "actions plus anciennes omises" in summary
+    assert "étape 29:" in summary and "étape 1:" not in summary
+    assert t._summary_size <= 100
+    assert len(t.prompt()) == 2
+
+def test_compact_result_keeps_salient_facts_within_budget():
+    papers = [{"id": f"2401.{n:05d}v1", "title": f"Titre {n}", "abstract": "x" * 2000} for n in range(20)]
+    snippet, facts = compact_result(text(json.dumps({"papers": papers})), budget=600)
+    assert len(snippet) == 600
+    assert facts["ids"][0] == "2401.00000v1" and facts["titles"][0] == "Titre 0"
+    assert len(facts["ids"]) == 10
+
+def test_salient_reads_free_text_patterns():
+    facts = salient(text("voir arXiv:2312.01234 et https://doi.org/10.1000/xyz123.\n@article{smith2020, title={Deep Nets}}"))
+    assert facts == {"ids": ["2312.01234"], "dois": ["10.1000/xyz123"], "bibtex_keys": ["smith2020"], "titles": ["Deep Nets"]}
+    assert digest(facts, limit=20).endswith("…")
+
+def test_compact_result_never_exceeds_its_budget():
+    papers = json.dumps({"papers": [{"id": "2401.00001", "title": "T" * 300, "abstract": "x" * 5000}]})
+    for content in (text(papers), text("y" * 5000), {"raw": "z" * 5000}):
+        for budget in (250, 600, 1500):
+            assert len(compact_result(content, budget=budget)[0]) <= budget
@@ -0,0 +1,141 @@
+import json, asyncio
+from types import SimpleNamespace
+import pytest
+from app.orchestrator import FairSlots, Orchestrator, plan_actions, _substitute
+
+class FakeHub:
+    def __init__(self, results=None, fail=()):
+        self.results, self.fail, self.calls = results or {}, set(fail), []
+
+    async def call(self, server, tool, args):
+        self.calls.append((tool, args))
+        await asyncio.sleep(0)
+        if tool in self.fail:
+            raise RuntimeError("boom")
+        return self.results.get(tool, f"{tool} ok")
+
+class FakeLogs:
+    def write(self, *args, **kwargs):
+        pass
+
+def make_orchestrator(hub):
+    o = Orchestrator.__new__(Orchestrator)
+    o.hub, o.logs = hub, FakeLogs()
+    return o
+
+def test_plan_actions_normalises_ids_and_dependencies():
+    plan = {"actions": [{"server": "arxiv", "tool": "search_papers"},
+                        {"id": 7, "server": "arxiv", "tool": "read_paper", "depends_on": "a1"},
+                        "pas une action",
+                        {"server": "fs", "tool": "write_file", "args": {"path": "x.md"}, "depends_on": [7]}]}
+    actions = plan_actions(plan, limit=8)
+    assert [a["id"] for a in actions] == ["a1", "7", "a3"]
+    assert [a["depends_on"] for a in actions] == [[], ["a1"], ["7"]]
+    assert actions[0]["args"] == {}
+    assert len(plan_actions(plan, limit=1)) == 1
+
+def test_plan_actions_accepts_single_action_form():
+    actions = plan_actions({"decision": "call_tool", "action": {"server": "fs", "tool": "list_dir"}}, limit=8)
+    assert [(a["id"], a["tool"]) for a in actions] == [("a1", "list_dir")]
+    assert plan_actions({"decision": "final_answer"}, limit=8) == []
+
+def test_run_plan_layers_by_dependencies():
+    hub = FakeHub()
+    actions = plan_actions({"actions": [
+        {"id": "w", "server": "fs", "tool": "write", "depends_on": ["r1", "r2"]},
+        {"id": "r1", "server": "arxiv", "tool": "read1", "depends_on": ["s"]},
+        {"id": "s", "server": "arxiv", "tool": "search"},
+        {"id": "r2", "server": "arxiv", "tool": "read2", "depends_on": ["s"]},
+    ]}, limit=8)
+    messages, digests = asyncio.run(make_orchestrator(hub)._run_plan(actions))
+    order = [tool for tool, _ in hub.calls]
+    assert order[0] == "search" and set(order[1:3]) == {"read1", "read2"} and order[3] == "write"
+    assert len(digests) == 4
+
+def test_run_plan_stops_after_failed_layer():
+    hub = FakeHub(fail={"search"})
+    actions = plan_actions({"actions": [
+        {"id": "s", "server": "arxiv", "tool": "search"},
+        {"id": "o", "server": "arxiv", "tool": "other"},
+        {"id": "r", "server": "arxiv", "tool": "read", "depends_on": ["s"]},
+    ]}, limit=8)
+    messages, digests = asyncio.run(make_orchestrator(hub)._run_plan(actions))
+    assert sorted(tool for tool, _ in hub.calls) == ["other", "search"]
+    assert "r (arxiv.read)" in messages[-1]["content"]
+
+def test_substitute_whole_result_and_field_paths():
+    outputs = {"a1": json.dumps({"papers": [{"id": "2401.00001v1", "year": 2024}]})}
+    assert _substitute("${a1}", outputs) == outputs["a1"]
+    assert _substitute({"id": "${a1.papers[0].id}"}, outputs) == {"id": "2401.00001v1"}
+    assert _substitute("${a1.papers[0].year}", outputs) == 2024
+    assert _substitute(["papier ${a1.papers[0].id} (${a1.papers[0].year})"], outputs) == ["papier 2401.00001v1 (2024)"]
+    assert _substitute("${a9.id}", outputs) == "${a9.id}"
+
+@pytest.mark.parametrize("ref", ["${a1.papers}", "${a1.papers[0]}", "${a1.papers[3].id}", "${a1.missing}", "${a2.id}"])
+def test_substitute_rejects_non_scalar_or_missing_paths(ref):
+    outputs = {"a1": json.dumps({"papers": [{"id": "2401.00001"}]}), "a2": "texte libre"}
+    with pytest.raises(ValueError):
+        _substitute({"q": ref}, outputs)
+
+def test_bad_reference_fails_the_action_instead_of_sending_the_blob():
+    hub = FakeHub(results={"search": json.dumps({"papers": [{"id": "1"}]})})
+    o = make_orchestrator(hub)
+    ok, _, msgs, _ = asyncio.run(o._run_action({"id": "a2", "server": "arxiv", "tool": "read",
+                                                "args": {"id": "${a1.papers}"}},
+                                               {"a1": hub.results["search"]}))
+    assert not ok and hub.calls == []
+    assert "scalaire" in msgs[0]["content"]
+
+def test_fair_slots_serve_owners_round_robin():
+    async def main():
+        slots, order = FairSlots(1), []
+        async def job(owner, n):
+            await slots.acquire(owner)
+            try:
+                order.append(f"{owner}{n}")
+                await asyncio.sleep(0)
+            finally:
+                slots.release()
+        await slots.acquire("x")  # place occupée: les suivants font la queue
+        tasks = [asyncio.create_task(job("a", n)) for n in range(3)] + [asyncio.create_task(job("b", n)) for n in range(2)]
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.gather(*tasks)
+        return order, slots
+    order, slots = asyncio.run(main())
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+    assert slots.active == 0 and not slots.queues
+
+def test_fair_slots_respect_limit_and_survive_cancellation():
+    async def main():
+        slots, running, peak = FairSlots(2), 0, 0
+        async def job(owner):
+            nonlocal running, peak
+            await slots.acquire(owner)
+            try:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.001)
+                running -= 1
+            finally:
+                slots.release()
+        tasks = [asyncio.create_task(job(i % 3)) for i in range(9)]
+        await asyncio.sleep(0)
+        tasks[5].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return slots, peak
+    slots, peak = asyncio.run(main())
+    assert peak == 2
+    assert slots.active == 0 and not slots.queues
+
+def test_result_text_is_joined_once_per_action(monkeypatch):
+    import app.orchestrator as orchestrator_module, app.compaction as compaction_module
+    joins, join = [], compaction_module.result_texts
+    def counting(content):
+        joins.append(1)
+        return join(content)
+    monkeypatch.setattr(orchestrator_module, "result_texts", counting)
+    monkeypatch.setattr(compaction_module, "result_texts", counting)
+    hub = FakeHub(results={"read": SimpleNamespace(content=[SimpleNamespace(text="texte intégral " * 1000)])})
+    ok, text, _, _ = asyncio.run(make_orchestrator(hub)._run_action({"id": "a1", "server": "arxiv", "tool": "read", "args": {}}, {}))
+    assert ok and text.startswith("texte intégral") and len(joins) == 1